@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Micro-benchmark of the table-driven text decoders against the per-byte
+# getString/getUTF8String/getCyrillicString path they replace (kept here as
+# the reference).
+#
+# The text of every block in the given PAC/FPC files is split into runs
+# between control codes, and each run is decoded both ways.
+
+
+from optparse import OptionParser
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from pypacc.codecs import OUTPUT_ERRORS, getTextDecoder
+from pypacc.cyrillic import CyrillicCodes, CyrillicLetters
+from pypacc.parser import TEXT_CONTROL_RE, iterPacBlocks
+
+
+def getString(encoding, byte_list, index):
+    """
+    Decode a single byte character w/ specified encoding
+    """
+
+    byte = byte_list[index:index + 1]
+    try:
+        char = byte.decode(encoding)
+    except UnicodeDecodeError:
+        char = ''
+    return char
+
+
+def getUTF8String(encoding, byte_list, index):
+    """
+    Decode a byte or sequence of bytes (up to 4) with utf-8
+    """
+
+    for idx in range(4):
+        byte = byte_list[index: index + idx]
+        char = ''
+        try:
+            char = byte.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+        if char == '\x1f' or char == '\ufeff':
+            pass
+        elif char != '':
+            return char
+
+    return char
+
+
+def getCyrillicString(encoding, byte_list, index):
+    """Extract Cyrillic string from byte sequence"""
+
+    b = byte_list[index:index + 1].decode('latin-1')
+    if b >= '\x30' and b <= '\x39':
+        return b
+
+    try:
+        idx = CyrillicCodes.index(b)
+        if idx >= 0:
+            char = CyrillicLetters[idx]
+            #return b.decode('iso-8859-5').encode('utf-8')
+            return char
+
+        if len(byte_list) > index + 1:
+            idx = CyrillicCodes.index(ord(b) * 256 + byte_list[index + 1])
+            if idx >= 0:
+                index += 1
+                char = CyrillicLetters[idx]
+                #return b.decode('iso-8859-5').encode('utf-8')
+                return char
+    except ValueError:
+        return b.encode('latin-1').decode('ascii', OUTPUT_ERRORS)
+
+
+# code page: (per-byte decoder, encoding it is called with)
+PER_BYTE_DECODERS = {'latin': (getString, 'iso-8859-1'),
+                     'thai': (getString, 'cp874'),
+                     'cyrillic': (getCyrillicString, 'iso-8859-5'),
+                     'utf-8': (getUTF8String, 'utf-8')}
+
+
+def perByteDecode(codePage, text_bytes):
+    """Decode a run of text one byte at a time, as the parser used to"""
+
+    getChar, encoding = PER_BYTE_DECODERS[codePage]
+    string_buffer = ''
+    for index in range(len(text_bytes)):
+        string_buffer += getChar(encoding, text_bytes, index)
+    return string_buffer
+
+
+def tableDecode(codePage, text_bytes):
+    """Decode a run of text with one call to the code page's decoder"""
+
+    return getTextDecoder(codePage)(text_bytes)
+
+
+def textRuns(real_bytes):
+    """Return the runs of text between control codes of every block"""
+
+    runs = []
+    for block in iterPacBlocks(real_bytes):
+        text = real_bytes[block[2] + 3: block[3] + 1]
+        runs.extend(run for run in TEXT_CONTROL_RE.split(text) if run)
+    return runs
+
+
+def bench(decode, codePage, runs, repeat, number):
+    def decodeAll():
+        for run in runs:
+            decode(codePage, run)
+
+    return min(timeit.repeat(decodeAll, repeat=repeat, number=number)) / number
+
+
+def main():
+    usage = "usage: python3 bench_decoders.py [options] pac_file [...]"
+    parser = OptionParser(usage=usage)
+    parser.add_option("-e", "--encoding", dest="codePages", action="append", help="code page to benchmark (repeatable), default: all")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=5, help="timing repeats, default: %default")
+    parser.add_option("-n", "--number", dest="number", type="int", default=10, help="decodes per repeat, default: %default")
+    (options, args) = parser.parse_args()
+    if len(args) == 0:
+        parser.print_help()
+        sys.exit(1)
+
+    runs = []
+    for subtitle_file in args:
+        with open(subtitle_file, 'rb') as inf:
+            runs.extend(textRuns(inf.read()))
+    size = sum(len(run) for run in runs)
+
+    print('{0} runs of text, {1} bytes'.format(len(runs), size))
+    print('{0:<10} {1:>12} {2:>12} {3:>9}'.format('code page', 'per-byte',
+                                                  'table', 'speedup'))
+    for codePage in options.codePages or sorted(PER_BYTE_DECODERS):
+        old = bench(perByteDecode, codePage, runs, options.repeat,
+                    options.number)
+        new = bench(tableDecode, codePage, runs, options.repeat,
+                    options.number)
+        print('{0:<10} {1:>9.1f} ms {2:>9.1f} ms {3:>8.1f}x'.format(
+            codePage, old * 1000, new * 1000, old / new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Cross-check and benchmark of the NumPy header reader (pypacc.headers).
+#
+# The start and end frames readHeaders returns for every block of the given
+# PAC/FPC files are compared with the blocks iterPacBlocks finds and with the
+# paragraphs getPacParagraph decodes from them, then both ways of reading the
+# time codes are timed. The exit status is 1 if they disagree.
+
+
+from optparse import OptionParser
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from pypacc.headers import readHeaders
+from pypacc.parser import getPacParagraph, iterPacBlocks
+from pypacc.timecode import getFrameRate
+
+
+def scanHeaders(real_bytes, frameRate):
+    """Read the time codes of every block with the parser's scan"""
+
+    framesFromPac = frameRate.framesFromPac
+    return [(framesFromPac(block[0]), framesFromPac(block[1]), block[2])
+            for block in iterPacBlocks(real_bytes)]
+
+
+def crossCheck(real_bytes, frameRate):
+    """
+    Compare readHeaders with the parser's scan and with getPacParagraph,
+    return the number of blocks and a list of differences
+    """
+
+    headers = readHeaders(real_bytes, frameRate)
+    expected = scanHeaders(real_bytes, frameRate)
+    found = list(zip(headers['start'].tolist(), headers['end'].tolist(),
+                     headers['marker'].tolist()))
+    if found != expected:
+        return len(expected), ['{0} blocks read, {1} scanned'.format(
+            len(found), len(expected))]
+
+    errors = []
+    for start, end, marker in found:
+        p = getPacParagraph(marker - 1, real_bytes, 'latin', frameRate)
+        if p is None:
+            continue  # The text runs into the end of the file
+        if (p.startTime.frames, p.endTime.frames) != (start, end):
+            errors.append('block at {0}: {1}-{2}, paragraph {3}-{4}'.format(
+                marker, start, end, p.startTime.frames, p.endTime.frames))
+    return len(found), errors
+
+
+def main():
+    usage = "usage: python3 bench_headers.py [options] pac_file [...]"
+    parser = OptionParser(usage=usage)
+    parser.add_option("--fps", dest="frameRate", default='25', help="frame rate of the time codes, default: %default")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=5, help="timing repeats, default: %default")
+    (options, args) = parser.parse_args()
+    if len(args) == 0:
+        parser.print_help()
+        sys.exit(1)
+
+    frameRate = getFrameRate(options.frameRate)
+    failed = False
+    print('{0:<32} {1:>8} {2:>10} {3:>10} {4:>9}'.format(
+        'file', 'blocks', 'scan', 'numpy', 'speedup'))
+    for subtitle_file in args:
+        with open(subtitle_file, 'rb') as inf:
+            real_bytes = inf.read()
+
+        blocks, errors = crossCheck(real_bytes, frameRate)
+        for error in errors[:10]:
+            print('{0}: {1}'.format(subtitle_file, error))
+        failed = failed or bool(errors)
+
+        old = min(timeit.repeat(lambda: scanHeaders(real_bytes, frameRate),
+                                repeat=options.repeat, number=1))
+        new = min(timeit.repeat(lambda: readHeaders(real_bytes, frameRate),
+                                repeat=options.repeat, number=1))
+        print('{0:<32} {1:>8} {2:>7.1f} ms {3:>7.1f} ms {4:>8.1f}x'.format(
+            os.path.basename(subtitle_file), blocks, old * 1000, new * 1000,
+            old / new))
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Benchmark of incremental re-parsing with a block index (pypacc.index).
+#
+# For each of the given PAC/FPC files, times a full parse with loadSubtitle,
+# the first loadIndexed (which builds the index), loadIndexed of the
+# unchanged file, and loadIndexed after edits of growing size: the text of
+# each block in a range of bytes from the middle of the file is reversed, so
+# that those blocks must be decoded again. The time of indexSubtitle alone,
+# without reading the files and making the paragraphs, is shown as well. The
+# paragraphs of every edit are checked against loadSubtitle, and the exit
+# status is 1 if they differ.
+
+
+from optparse import OptionParser
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from pypacc.index import INDEX_SUFFIX, BlockIndex, indexSubtitle, loadIndexed
+from pypacc.parser import iterPacBlocks, loadSubtitle
+import corpus
+
+
+# Sizes of the edits, in bytes
+EDIT_SIZES = '1,64,4K,64K,1M'
+
+
+def paragraphKeys(paragraphs):
+    return [(p.startTime.totalMilliseconds, p.endTime.totalMilliseconds,
+             p.text) for p in paragraphs]
+
+
+def editBytes(data, size):
+    """
+    Reverse the text of the blocks in size bytes from the middle of data (at
+    least one), return the edited bytes and the number of blocks edited
+    """
+
+    edited = bytearray(data)
+    middle = len(data) // 2
+    blocks = 0
+    for block in iterPacBlocks(data):
+        if block[2] < middle:
+            continue
+        if blocks and block[2] >= middle + size:
+            break
+        # After the 0xFE, alignment and format code of the first line
+        text = slice(block[2] + 3, block[3] + 1)
+        edited[text] = data[text][::-1]
+        blocks += 1
+    return bytes(edited), blocks
+
+
+def best(repeat, function, *args):
+    """Return the shortest time of repeat runs of function, and its result"""
+
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def timeIndexed(subtitle_file, data, oldIndex, codePage, repeat):
+    """
+    Time loadIndexed of data saved as subtitle_file with oldIndex saved as
+    its index, return the time and the paragraphs
+    """
+
+    with open(subtitle_file, 'wb') as outf:
+        outf.write(data)
+    packed = oldIndex.pack()
+    times = []
+    for i in range(repeat):
+        with open(subtitle_file + INDEX_SUFFIX, 'wb') as outf:
+            outf.write(packed)
+        start = time.perf_counter()
+        paragraphs = loadIndexed(subtitle_file, codePage)
+        times.append(time.perf_counter() - start)
+    return min(times), paragraphs
+
+
+def main():
+    usage = "usage: python3 bench_index.py [options] pac_file [...]"
+    parser = OptionParser(usage=usage)
+    parser.add_option("-e", "--encoding", dest="codePage", help="code page of the files, default: detected")
+    parser.add_option("--sizes", dest="sizes", default=EDIT_SIZES, help="edit sizes in bytes, separated by commas, default: %default")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=3, help="timing repeats, default: %default")
+    (options, args) = parser.parse_args()
+    if len(args) == 0:
+        parser.print_help()
+        sys.exit(1)
+
+    sizes = [corpus.parseSize(size) for size in options.sizes.split(',')]
+    failed = False
+    directory = tempfile.mkdtemp()
+    try:
+        for path in args:
+            with open(path, 'rb') as inf:
+                data = inf.read()
+            subtitle_file = os.path.join(directory, os.path.basename(path))
+            shutil.copyfile(path, subtitle_file)
+
+            full = best(options.repeat, loadSubtitle, path,
+                        options.codePage)[0]
+            build = best(1, loadIndexed, subtitle_file, options.codePage)[0]
+            blockIndex = BlockIndex.load(subtitle_file + INDEX_SUFFIX)
+            codePage = blockIndex.codePage
+            print('{0}: {1} blocks, loadSubtitle {2:.1f} ms, first '
+                  'loadIndexed {3:.1f} ms'.format(
+                      os.path.basename(path), len(blockIndex), full * 1000,
+                      build * 1000))
+            print('{0:>10} {1:>8} {2:>13} {3:>15} {4:>8}'.format(
+                'edit', 'blocks', 'indexSubtitle', 'loadIndexed', 'of full'))
+
+            for size in [0] + sizes:
+                edited, blocks = editBytes(data, size) if size else (data, 0)
+                index = best(options.repeat, indexSubtitle, edited, codePage,
+                             blockIndex.frameRate, blockIndex)[0]
+                elapsed, paragraphs = timeIndexed(subtitle_file, edited,
+                                                  blockIndex, codePage,
+                                                  options.repeat)
+                if size and paragraphKeys(paragraphs) != paragraphKeys(
+                        loadSubtitle(subtitle_file, codePage)):
+                    print('{0}: paragraphs differ after a {1} byte '
+                          'edit'.format(path, size))
+                    failed = True
+                print('{0:>10} {1:>8} {2:>10.1f} ms {3:>12.1f} ms '
+                      '{4:>7.0%}'.format(size or 'none', blocks, index * 1000,
+                                         elapsed * 1000, elapsed / full))
+    finally:
+        shutil.rmtree(directory)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
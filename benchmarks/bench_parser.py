@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Parser benchmark suite.
+#
+# Generates a synthetic corpus (see corpus.py) for each code page and size,
+# then times loadSubtitle, autoDetect, getPacParagraph and writeOut on it
+# separately. Each phase runs in a child process so that its peak RSS can be
+# measured. Results can be saved as a JSON baseline and compared with a
+# later run to spot regressions.
+
+
+from optparse import OptionParser
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from pypacc.detect import autoDetect
+from pypacc.parser import (PARSER_VERSION, getPacParagraph, iterPacBlocks,
+                           loadSubtitle)
+from pypacc.writers import writeOut
+import corpus
+
+
+# Code page each corpus is loaded with ('chinese' files are big5 W16 blocks,
+# which are decoded whatever the code page)
+LOAD_CODE_PAGES = {'latin': 'latin',
+                   'cyrillic': 'cyrillic',
+                   'thai': 'thai',
+                   'chinese': 'thai',
+                   'utf-8': 'utf-8'}
+
+
+def phaseLoadSubtitle(path, codePage):
+    return len(loadSubtitle(path, codePage))
+
+
+def phaseAutoDetect(path, codePage):
+    return len(autoDetect(path)[0])
+
+
+def phaseGetPacParagraph(path, codePage, blockStarts):
+    with open(path, 'rb') as inf:
+        real_bytes = inf.read()
+    cues = 0
+    for index in blockStarts:
+        if getPacParagraph(index, real_bytes, codePage) is not None:
+            cues += 1
+    return cues
+
+
+def phaseWriteOut(path, codePage, paragraphs):
+    writeOut(paragraphs, 'SRT', os.devnull)
+    return len(paragraphs)
+
+
+PHASES = ['loadSubtitle', 'autoDetect', 'getPacParagraph', 'writeOut']
+
+
+def runPhase(phase, path, codePage, conn):
+    """Run one phase in a child process, send back (seconds, cues, RSS)"""
+
+    # Inputs of a phase are prepared before the clock starts
+    if phase == 'loadSubtitle':
+        args = ()
+        run = phaseLoadSubtitle
+    elif phase == 'autoDetect':
+        args = ()
+        run = phaseAutoDetect
+    elif phase == 'getPacParagraph':
+        with open(path, 'rb') as inf:
+            real_bytes = inf.read()
+        # Start just before each block's marker
+        args = ([block[2] - 1 for block in iterPacBlocks(real_bytes)],)
+        del real_bytes
+        run = phaseGetPacParagraph
+    elif phase == 'writeOut':
+        args = (loadSubtitle(path, codePage),)
+        run = phaseWriteOut
+
+    start = time.time()
+    cues = run(path, codePage, *args)
+    elapsed = time.time() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.send((elapsed, cues, peak))
+    conn.close()
+
+
+def timePhase(phase, path, codePage, repeat):
+    """Return the best time, cue count and peak RSS (KB) of a phase"""
+
+    best = None
+    maxPeak = 0
+    for i in range(repeat):
+        parent, child = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=runPhase,
+                                          args=(phase, path, codePage, child))
+        process.start()
+        child.close()
+        elapsed, cues, peak = parent.recv()
+        process.join()
+        maxPeak = max(maxPeak, peak)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, cues, maxPeak
+
+
+def makeCorpus(directory, codePage, label, size):
+    path = os.path.join(directory, corpus.fileName(codePage, label))
+    if not os.path.exists(path):
+        with open(path, 'wb') as outf:
+            cues = corpus.generate(outf, codePage, size=size)
+        corpus.checkCues(path, cues)
+    return path
+
+
+def benchmark(directory, codePages, sizes, phases, repeat):
+    """Run every phase on every corpus file, return the results by name"""
+
+    results = {}
+    for codePage in codePages:
+        for label in sizes:
+            path = makeCorpus(directory, codePage, label,
+                              corpus.parseSize(label))
+            size = os.path.getsize(path)
+            name = '{0}-{1}'.format(codePage, label)
+            results[name] = {}
+            for phase in phases:
+                elapsed, cues, peak = timePhase(phase, path,
+                                                LOAD_CODE_PAGES[codePage],
+                                                repeat)
+                elapsed = max(elapsed, 1e-9)
+                results[name][phase] = {'seconds': elapsed,
+                                        'cues': cues,
+                                        'bytes_per_s': size / elapsed,
+                                        'cues_per_s': cues / elapsed,
+                                        'peak_rss_kb': peak}
+                print('{0:<18} {1:<16} {2:>9.4f}s {3:>9.2f} MB/s '
+                      '{4:>11.0f} cues/s {5:>8} KB'.format(
+                          name, phase, elapsed, size / elapsed / 1e6,
+                          cues / elapsed, peak))
+                sys.stdout.flush()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against a baseline, return the number of regressions"""
+
+    regressions = 0
+    print()
+    print('Compared with baseline ({0:.0%} tolerance):'.format(tolerance))
+    for name in sorted(results):
+        for phase in PHASES:
+            if phase not in results[name]:
+                continue
+            try:
+                old = baseline['results'][name][phase]['seconds']
+            except KeyError:
+                continue
+            new = results[name][phase]['seconds']
+            change = new / old - 1
+            flag = ''
+            if change > tolerance:
+                flag = 'REGRESSION'
+                regressions += 1
+            print('{0:<18} {1:<16} {2:>+8.1%} {3}'.format(name, phase, change,
+                                                          flag))
+    return regressions
+
+
+def main():
+    usage = "usage: python3 bench_parser.py [options]"
+    parser = OptionParser(usage=usage)
+    parser.add_option("-e", "--encoding", dest="codePages", action="append", help="code page (repeatable): " + ", ".join(corpus.CODE_PAGES) + ", default: all")
+    parser.add_option("-s", "--size", dest="sizes", action="append", help="corpus file size (repeatable), e.g. 1K, 1M, 100M, default: 1K, 100K, 1M")
+    parser.add_option("-p", "--phase", dest="phases", action="append", help="phase to time (repeatable): " + ", ".join(PHASES) + ", default: all")
+    parser.add_option("-r", "--repeat", dest="repeat", type="int", default=3, help="runs of each phase (the best is kept), default: %default")
+    parser.add_option("-d", "--corpus", dest="corpus", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus'), help="directory of the generated corpus, default: %default")
+    parser.add_option("-o", "--save", dest="save", help="save the results as a JSON baseline")
+    parser.add_option("-c", "--compare", dest="baseline", help="compare with a JSON baseline; exit with status 1 on regressions")
+    parser.add_option("-t", "--tolerance", dest="tolerance", type="float", default=0.10, help="slowdown allowed before a regression is reported, default: %default")
+    (options, args) = parser.parse_args()
+
+    if not os.path.isdir(options.corpus):
+        os.makedirs(options.corpus)
+
+    results = benchmark(options.corpus, options.codePages or corpus.CODE_PAGES,
+                        options.sizes or ['1K', '100K', '1M'],
+                        options.phases or PHASES, options.repeat)
+
+    if options.save:
+        with open(options.save, 'w') as outf:
+            json.dump({'python': platform.python_version(),
+                       'parser_version': PARSER_VERSION,
+                       'results': results}, outf, indent=2, sort_keys=True)
+
+    if options.baseline:
+        with open(options.baseline) as inf:
+            baseline = json.load(inf)
+        if compare(results, baseline, options.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
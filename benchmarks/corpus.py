@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Synthetic PAC/FPC corpus generator.
+#
+# Writes files in the layout pypacc parses: a file header, then for each
+# subtitle its number, the 0x60 time code header, the text length, the 0xFE
+# marker and the text, and finally a trailer. Text is made of random words
+# for the given code page (Cyrillic includes the two-byte codes, Chinese is
+# written as big5 W16 blocks, utf-8 as FPC). The same seed always gives the
+# same file.
+
+
+from optparse import OptionParser
+import os
+import random
+import struct
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from pypacc.codecs import loadCyrillicTables
+from pypacc.parser import iterPacBlocks
+from pypacc.writers import pacBlockNumber
+
+
+CODE_PAGES = ['latin', 'cyrillic', 'thai', 'chinese', 'utf-8']
+
+FILE_HEADER = b'\x01' + b'\x00' * 20
+FILE_TRAILER = b'\xff' + b'\x00' * 11 + b'\x11\x00' + b'dummy end of file'
+
+# 0xFE, alignment, 0x03 starts a line; W16 lines have extra codes around
+# the 'W16' the parser checks for
+LINE_START = b'\xfe\x02\x03'
+W16_FIRST_LINE = b'\xfe\x02\x03\x1fW16\x02'
+W16_NEXT_LINE = b'\xfe\x02\x03\x1fW16\x02\x00\x00'
+
+LATIN_WORDS = ('the of and to in is you that it he was for on are as with '
+               'his they at be this have from or one had by word but not '
+               'what all were we when your can said there use an each which '
+               'café déjà naïve garçon élève über straße año niño señor '
+               'fiancée résumé façade piñata crème brûlée').split()
+
+VIETNAMESE_WORDS = ('bầu cử thống đốc sơ bộ chúng tôi định theo sát toàn '
+                    'sự kiện ôi nghiêm túc đi không có gì được người này '
+                    'một những với trong của cho là và anh em chị').split()
+
+
+def byteWords(words, encoding):
+    return [word.encode(encoding) for word in words]
+
+
+def cyrillicSyllables():
+    """Byte codes of the Cyrillic letters pypacc decodes, incl. 2-byte"""
+
+    codes = []
+    for code, letter in loadCyrillicTables().items():
+        if 'Ѐ' <= letter[:1] <= 'ӿ':
+            codes.append(code)
+    return sorted(codes)
+
+
+def thaiSyllables():
+    """Byte codes of Thai consonants and vowels in cp874"""
+
+    consonants = [bytes([b]) for b in range(0xa1, 0xcf)]
+    vowels = [bytes([b]) for b in list(range(0xd0, 0xda)) +
+              list(range(0xe0, 0xe5))]
+    return consonants + vowels
+
+
+def big5Characters():
+    """W16 codes of common CJK characters in big5"""
+
+    chars = []
+    for code in range(0x4e00, 0x9fa6, 7):
+        try:
+            chars.append(chr(code).encode('big5'))
+        except UnicodeEncodeError:
+            pass
+    return chars
+
+
+class TextMaker(object):
+    """Make random lines of text (as bytes) for a code page"""
+
+    def __init__(self, codePage, rng):
+        self.codePage = codePage
+        self.rng = rng
+        if codePage == 'latin':
+            self.words = byteWords(LATIN_WORDS, 'iso-8859-1')
+        elif codePage == 'utf-8':
+            self.words = byteWords(VIETNAMESE_WORDS, 'utf-8')
+        elif codePage == 'cyrillic':
+            self.syllables = cyrillicSyllables()
+        elif codePage == 'thai':
+            self.syllables = thaiSyllables()
+        elif codePage == 'chinese':
+            self.syllables = big5Characters()
+        else:
+            raise ValueError('Unknown code page: ' + codePage)
+
+    def word(self):
+        rng = self.rng
+        if self.codePage in ('latin', 'utf-8'):
+            return rng.choice(self.words)
+        return b''.join(rng.choice(self.syllables)
+                       for i in range(rng.randint(2, 7)))
+
+    def line(self):
+        words = [self.word() for i in range(self.rng.randint(2, 8))]
+        if self.codePage == 'chinese':
+            # W16 text: big5 characters, ascii characters after a 0x00
+            return b'\x00 '.join(words)
+        if self.codePage == 'utf-8':
+            return b'\x1f\xef\xbb\xbf' + b' '.join(words) + b'.'
+        return b' '.join(words)
+
+    def text(self):
+        """The text of a subtitle, from the first 0xFE on"""
+
+        lines = [self.line() for i in range(self.rng.randint(1, 2))]
+        if self.codePage == 'chinese':
+            return W16_FIRST_LINE + W16_NEXT_LINE.join(lines)
+        return LINE_START + LINE_START.join(lines)
+
+
+def timeCode(frames, frameRate=25):
+    """Pack a frame count as the two PAC time code words"""
+
+    seconds, frames = divmod(frames, frameRate)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return struct.pack('<HH', hours % 600 * 100 + minutes,
+                       seconds * 100 + frames)
+
+
+def subtitleBlock(number, startFrame, endFrame, text):
+    """Pack one subtitle: number, time codes, text length, text"""
+
+    # The length counts the vertical alignment byte before the text, and
+    # numbers with a 0xFE byte are skipped as PACWriter does
+    return (struct.pack('<H', pacBlockNumber(number + 1)) + b'\x60' +
+            timeCode(startFrame) + timeCode(endFrame) +
+            struct.pack('<H', len(text) + 1) + b'\x0a' + text + b'\x00')
+
+
+def generate(outf, codePage, cues=None, size=None, seed=0):
+    """
+    Write a synthetic file of cues subtitles, or of about size bytes,
+    to the file object outf. Return the number of subtitles written.
+    """
+
+    if cues is None and size is None:
+        raise ValueError('Give a number of cues or a size')
+
+    rng = random.Random('{0}-{1}'.format(codePage, seed))
+    maker = TextMaker(codePage, rng)
+    outf.write(FILE_HEADER)
+    written = len(FILE_HEADER) + len(FILE_TRAILER)
+    number = 0
+    frame = 10 * 3600 * 25
+    while True:
+        if cues is not None and number >= cues:
+            break
+        if size is not None and written >= size:
+            break
+        start = frame + rng.randint(5, 50)
+        frame = start + rng.randint(25, 150)
+        block = subtitleBlock(number, start, frame, maker.text())
+        outf.write(block)
+        written += len(block)
+        number += 1
+    outf.write(FILE_TRAILER)
+
+    return number
+
+
+def checkCues(path, cues):
+    """Raise ValueError unless the parser finds cues blocks in the file"""
+
+    with open(path, 'rb') as inf:
+        blocks = sum(1 for block in iterPacBlocks(inf.read()))
+    if blocks != cues:
+        raise ValueError('{0}: {1} subtitles written, {2} parsed'.format(
+            path, cues, blocks))
+
+
+def fileName(codePage, label):
+    extension = 'fpc' if codePage == 'utf-8' else 'pac'
+    return '{0}-{1}.{2}'.format(codePage, label, extension)
+
+
+def parseSize(text):
+    """Parse a size such as 512, 1K, 10M or 1G"""
+
+    units = {'K': 2 ** 10, 'M': 2 ** 20, 'G': 2 ** 30}
+    text = text.strip().upper()
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def main():
+    usage = "usage: python3 corpus.py [options] out_file"
+    parser = OptionParser(usage=usage)
+    parser.add_option("-e", "--encoding", dest="codePage", default="latin", help="code page: " + ", ".join(CODE_PAGES) + ", default: %default")
+    parser.add_option("-n", "--cues", dest="cues", type="int", help="number of subtitles")
+    parser.add_option("-s", "--size", dest="size", help="approximate file size, e.g. 1K, 10M, 100M")
+    parser.add_option("--seed", dest="seed", type="int", default=0, help="random seed, default: %default")
+    (options, args) = parser.parse_args()
+    if len(args) != 1 or (options.cues is None and options.size is None):
+        parser.print_help()
+        sys.exit(1)
+
+    size = parseSize(options.size) if options.size else None
+    with open(args[0], 'wb') as outf:
+        cues = generate(outf, options.codePage, options.cues, size,
+                        options.seed)
+    try:
+        checkCues(args[0], cues)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print('{0}: {1} subtitles, {2} bytes'.format(args[0], cues,
+                                                 os.path.getsize(args[0])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Fuzzing and differential testing of the parser.
+#
+# Mutates the sample files and synthetic corpus files (see corpus.py) and
+# parses each mutant in a child process with a time and memory budget. An
+# input is flagged when the parser crashes (anything but a PacError), runs
+# out of its budget, gives different paragraphs when parsed whole, streamed,
+# in rich mode and read back from a block index or a parse cache entry, or
+# takes superlinear time: the mutant is also parsed tiled --scale times,
+# which should take about --scale times as long. The seeds themselves are
+# checked first. Flagged inputs are minimized and saved with a description in
+# --out, and can be run again with --replay.
+
+
+from io import BytesIO
+from optparse import OptionParser
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import resource
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from pypacc.cache import packParagraphs, unpackParagraphs
+from pypacc.errors import PacError
+from pypacc.index import BlockIndex, indexSubtitle
+from pypacc.parser import getPacParagraph, iterParagraphs, parse
+import corpus
+
+
+# Code page the seeds of each corpus code page are parsed with (None
+# auto-detects, as for the samples)
+SEED_CODE_PAGES = {'latin': 'latin',
+                   'cyrillic': 'cyrillic',
+                   'thai': 'thai',
+                   'chinese': 'thai',
+                   'utf-8': 'utf-8'}
+
+# Bytes put in the text of an extra chinese seed: big5 does not map them, so
+# they are passed through as two surrogate escapes, which are also the utf-8
+# of 'ȯ' and must be read back from indexes and the parse cache unchanged
+ESCAPED_SEED_BYTES = b'\xc8\xaf'
+
+# Size of the chunks mutants are streamed in, small and odd so that blocks
+# cross chunk boundaries
+FUZZ_STREAM_CHUNK = 61
+
+# Tiled runs shorter than this (in seconds) are too noisy to judge scaling
+SCALING_MIN_SECONDS = 0.05
+
+# Time a tiled run may take, in multiples of the single run and tiling
+# factor, before it is flagged as superlinear
+SCALING_SLACK = 3.0
+
+# Most runs spent minimizing one input
+MINIMIZE_MAX_RUNS = 100
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           os.pardir, 'samples')
+
+
+class Mismatch(Exception):
+    """Two ways of parsing the same input disagree"""
+
+
+def loadSeeds(codePages, cues):
+    """Return the seed inputs as (name, bytes, code page) tuples"""
+
+    seeds = []
+    for filename in sorted(os.listdir(SAMPLES_DIR)):
+        if filename[-4:].lower() in ('.pac', '.fpc'):
+            with open(os.path.join(SAMPLES_DIR, filename), 'rb') as inf:
+                seeds.append((filename, inf.read(), None))
+    for codePage in codePages:
+        outf = BytesIO()
+        corpus.generate(outf, codePage, cues=cues)
+        name = corpus.fileName(codePage, cues)
+        data = outf.getvalue()
+        seeds.append((name, data, SEED_CODE_PAGES[codePage]))
+        if codePage == 'chinese':
+            # After the W16 codes of the first line of the first block
+            index = data.index(b'W16\x02') + 4
+            seeds.append(('escaped-' + name,
+                          data[:index] + ESCAPED_SEED_BYTES + data[index:],
+                          SEED_CODE_PAGES[codePage]))
+    return seeds
+
+
+# Mutators: each takes a random.Random and the bytes, returns new bytes
+
+def flipBits(rng, data):
+    data = bytearray(data)
+    for i in range(rng.randint(1, 8)):
+        data[rng.randrange(len(data))] ^= 1 << rng.randrange(8)
+    return bytes(data)
+
+
+def setBytes(rng, data):
+    """Overwrite bytes with values the parser looks for"""
+
+    data = bytearray(data)
+    for i in range(rng.randint(1, 8)):
+        data[rng.randrange(len(data))] = rng.choice(
+            [0x00, 0x03, 0x1f, 0x60, 0x61, 0x80, 0xe0, 0xfe, 0xff])
+    return bytes(data)
+
+
+def insertMarkers(rng, data):
+    index = rng.randrange(len(data) + 1)
+    marker = rng.choice([b'\xfe', b'\x60', b'W16', b'\xfe\x02\x03\x1fW16\x02',
+                         b'\x60' + b'\x00' * 14 + b'\xfe'])
+    return data[:index] + marker * rng.randint(1, 64) + data[index:]
+
+
+def truncate(rng, data):
+    return data[:rng.randrange(len(data))]
+
+
+def deleteRange(rng, data):
+    start = rng.randrange(len(data))
+    return data[:start] + data[start + rng.randint(1, 256):]
+
+
+def duplicateRange(rng, data):
+    start = rng.randrange(len(data))
+    chunk = data[start:start + rng.randint(1, 512)]
+    index = rng.randrange(len(data) + 1)
+    return data[:index] + chunk * rng.randint(1, 16) + data[index:]
+
+
+def setLength(rng, data):
+    """Give a block an extreme text length"""
+
+    headers = [i for i in range(len(data) - 11) if data[i] == 0x60]
+    if not headers:
+        return flipBits(rng, data)
+    index = rng.choice(headers) + 9
+    length = rng.choice([0, 1, 2, 3, 0x7fff, 0xfffe, 0xffff,
+                         rng.randrange(0x10000)])
+    return data[:index] + struct.pack('<H', length) + data[index + 2:]
+
+
+def setTimeCode(rng, data):
+    """Give a block out of range time code words"""
+
+    headers = [i for i in range(len(data) - 9) if data[i] == 0x60]
+    if not headers:
+        return flipBits(rng, data)
+    index = rng.choice(headers) + 1 + 2 * rng.randrange(4)
+    word = rng.choice([0, 99, 100, 9999, 10000, 0xffff,
+                       rng.randrange(0x10000)])
+    return data[:index] + struct.pack('<H', word) + data[index + 2:]
+
+
+def randomBytes(rng, data):
+    index = rng.randrange(len(data) + 1)
+    return (data[:index] +
+            bytes(rng.randrange(256) for i in range(rng.randint(1, 256))) +
+            data[index:])
+
+
+MUTATORS = [flipBits, setBytes, insertMarkers, truncate, deleteRange,
+            duplicateRange, setLength, setTimeCode, randomBytes]
+
+
+def mutate(rng, data):
+    """Apply one to four random mutators"""
+
+    for i in range(rng.randint(1, 4)):
+        if not data:
+            break
+        data = rng.choice(MUTATORS)(rng, data)
+    return data
+
+
+def paragraphKeys(paragraphs):
+    return [(p.startTime.totalMilliseconds, p.endTime.totalMilliseconds,
+             p.text) for p in paragraphs]
+
+
+def checkInput(data, codePage):
+    """
+    Parse data whole, streamed, in rich mode, through a block index and a
+    parse cache entry read back from their packed forms and from its first
+    block, raise Mismatch if the paragraphs differ. PacErrors are expected.
+    """
+
+    try:
+        track = parse(data, codePage)
+    except PacError:
+        return 0
+    expected = paragraphKeys(track)
+
+    if codePage:
+        streamed = paragraphKeys(iterParagraphs(BytesIO(data), codePage,
+                                                FUZZ_STREAM_CHUNK))
+        if streamed != expected:
+            raise Mismatch('streamed: {0} paragraphs, whole: {1}'.format(
+                len(streamed), len(expected)))
+
+        rich = parse(data, codePage, rich=True)
+        if rich.texts != track.texts:
+            raise Mismatch('rich mode texts differ')
+
+        blockIndex = BlockIndex.unpack(indexSubtitle(data, codePage).pack())
+        if paragraphKeys(blockIndex.getParagraphs()) != expected:
+            raise Mismatch('block index read back differs')
+
+        cached = unpackParagraphs(packParagraphs(list(track), codePage,
+                                                 None))[0]
+        if paragraphKeys(cached) != expected:
+            raise Mismatch('parse cache entry read back differs')
+
+        getPacParagraph(0, data, codePage)
+
+    return len(expected)
+
+
+def runCheck(data, codePage, memoryLimit, conn):
+    """Run checkInput in a child process, send back (status, detail, s)"""
+
+    if memoryLimit:
+        resource.setrlimit(resource.RLIMIT_AS, (memoryLimit, memoryLimit))
+    start = time.time()
+    try:
+        cues = checkInput(data, codePage)
+        result = ('ok', '{0} paragraphs'.format(cues))
+    except Mismatch as e:
+        result = ('mismatch', str(e))
+    except MemoryError:
+        result = ('memory', 'MemoryError')
+    except Exception as e:
+        result = ('crash', '{0}: {1}'.format(type(e).__name__, e))
+    conn.send(result + (time.time() - start,))
+    conn.close()
+
+
+def runBudgeted(data, codePage, timeBudget, memoryLimit):
+    """
+    Check data in a child process within the budget,
+    return (status, detail, seconds)
+    """
+
+    parent, child = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=runCheck,
+                                      args=(data, codePage, memoryLimit,
+                                            child))
+    start = time.time()
+    process.start()
+    child.close()
+    if parent.poll(timeBudget):
+        try:
+            result = parent.recv()
+        except EOFError:
+            result = None
+    else:
+        result = None
+    elapsed = time.time() - start
+    if result is None:
+        if process.is_alive():
+            process.kill()
+            process.join()
+            return 'timeout', 'over {0}s'.format(timeBudget), elapsed
+        process.join()
+        return 'killed', 'exit code {0}'.format(process.exitcode), elapsed
+    process.join()
+    return result
+
+
+def checkScaling(data, codePage, seconds, scale, timeBudget, memoryLimit):
+    """
+    Parse data tiled scale times, return a description if that takes
+    superlinear time, else None
+    """
+
+    status, detail, tiled = runBudgeted(data * scale, codePage,
+                                        timeBudget * scale, memoryLimit)
+    if status not in ('ok', 'mismatch'):
+        return 'tiled x{0}: {1} ({2})'.format(scale, status, detail)
+    if tiled >= SCALING_MIN_SECONDS and \
+            tiled > max(seconds, 1e-3) * scale * SCALING_SLACK:
+        return 'tiled x{0}: {1:.3f}s for {2:.3f}s'.format(scale, tiled,
+                                                          seconds)
+    return None
+
+
+def minimize(data, codePage, status, timeBudget, memoryLimit):
+    """
+    Remove chunks of data while it still fails with the same status,
+    halving the chunk size down to one byte
+    """
+
+    runs = 0
+    chunk = max(len(data) // 2, 1)
+    while chunk >= 1 and runs < MINIMIZE_MAX_RUNS:
+        index = 0
+        while index < len(data) and runs < MINIMIZE_MAX_RUNS:
+            candidate = data[:index] + data[index + chunk:]
+            runs += 1
+            if candidate and runBudgeted(candidate, codePage, timeBudget,
+                                         memoryLimit)[0] == status:
+                data = candidate
+            else:
+                index += chunk
+        chunk //= 2
+    return data
+
+
+def saveReproducer(outDir, data, codePage, status, detail, seed):
+    """Save a failing input and its description, return its path"""
+
+    if not os.path.isdir(outDir):
+        os.makedirs(outDir)
+    name = '{0}-{1}'.format(status, hashlib.sha1(data).hexdigest()[:12])
+    path = os.path.join(outDir, name + '.pac')
+    with open(path, 'wb') as outf:
+        outf.write(data)
+    with open(os.path.join(outDir, name + '.json'), 'w') as outf:
+        json.dump({'status': status, 'detail': detail, 'codePage': codePage,
+                   'seed': seed, 'size': len(data)}, outf, indent=2,
+                  sort_keys=True)
+    return path
+
+
+def replay(path, timeBudget, memoryLimit):
+    """Run a saved reproducer again, return its status"""
+
+    codePage = None
+    description = os.path.splitext(path)[0] + '.json'
+    if os.path.exists(description):
+        with open(description) as inf:
+            codePage = json.load(inf)['codePage']
+    with open(path, 'rb') as inf:
+        data = inf.read()
+    status, detail, elapsed = runBudgeted(data, codePage, timeBudget,
+                                          memoryLimit)
+    print('{0}: {1} ({2}) in {3:.3f}s'.format(path, status, detail, elapsed))
+    return status
+
+
+def fuzz(seeds, iterations, seed, timeBudget, memoryLimit, scale, outDir,
+         shouldMinimize):
+    """Run the fuzzer, return the number of inputs flagged"""
+
+    rng = random.Random(seed)
+    flagged = 0
+    seen = set()
+    start = time.time()
+    for name, data, codePage in seeds:
+        status, detail, seconds = runBudgeted(data, codePage, timeBudget,
+                                              memoryLimit)
+        if status != 'ok':
+            flagged += 1
+            path = saveReproducer(outDir, data, codePage, status, detail,
+                                  '{0}/{1}'.format(seed, name))
+            print('{0} in seed {1}: {2} -> {3}'.format(status, name, detail,
+                                                       path))
+    for i in range(iterations):
+        name, data, codePage = rng.choice(seeds)
+        mutant = mutate(rng, data)
+        status, detail, seconds = runBudgeted(mutant, codePage, timeBudget,
+                                              memoryLimit)
+        if status == 'ok' and scale > 1:
+            scaling = checkScaling(mutant, codePage, seconds, scale,
+                                   timeBudget, memoryLimit)
+            if scaling is not None:
+                status, detail = 'superlinear', scaling
+        if status == 'ok':
+            continue
+
+        signature = (status, detail.split(':')[0], codePage)
+        if signature in seen:
+            continue
+        seen.add(signature)
+        flagged += 1
+        if shouldMinimize and status != 'superlinear':
+            mutant = minimize(mutant, codePage, status, timeBudget,
+                              memoryLimit)
+        path = saveReproducer(outDir, mutant, codePage, status, detail,
+                              '{0}/{1}'.format(seed, i))
+        print('{0} from {1}: {2} ({3}) -> {4}'.format(
+            status, name, detail, len(mutant), path))
+        sys.stdout.flush()
+
+    print('{0} inputs in {1:.1f}s, {2} flagged'.format(
+        iterations, time.time() - start, flagged))
+    return flagged
+
+
+def main():
+    usage = ("usage: python3 fuzz.py [options]\n"
+             "       python3 fuzz.py --replay FILE...")
+    parser = OptionParser(usage=usage)
+    parser.add_option("-n", "--iterations", dest="iterations", type="int", default=1000, help="number of mutants to run, default: %default")
+    parser.add_option("--seed", dest="seed", type="int", default=0, help="random seed, default: %default")
+    parser.add_option("-e", "--encoding", dest="codePages", action="append", help="code page of the synthetic seeds (repeatable): " + ", ".join(corpus.CODE_PAGES) + ", default: all")
+    parser.add_option("--cues", dest="cues", type="int", default=50, help="subtitles in each synthetic seed, default: %default")
+    parser.add_option("-t", "--time", dest="timeBudget", type="float", default=2.0, help="seconds allowed per input, default: %default")
+    parser.add_option("-m", "--memory", dest="memory", type="int", default=512, help="address space allowed per input in MB (0 for no limit), default: %default")
+    parser.add_option("--scale", dest="scale", type="int", default=8, help="tiling factor of the superlinear runtime check (1 to skip it), default: %default")
+    parser.add_option("--no-minimize", action="store_false", dest="minimize", default=True, help="save flagged inputs as they are")
+    parser.add_option("-o", "--out", dest="outDir", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fuzz-out'), help="directory of the reproducers, default: %default")
+    parser.add_option("--replay", action="store_true", dest="replay", help="run the reproducers given as arguments again")
+    (options, args) = parser.parse_args()
+
+    memoryLimit = options.memory * 2 ** 20
+    if options.replay:
+        statuses = [replay(path, options.timeBudget, memoryLimit)
+                    for path in args]
+        sys.exit(0 if all(status == 'ok' for status in statuses) else 1)
+
+    seeds = loadSeeds(options.codePages or corpus.CODE_PAGES, options.cues)
+    if fuzz(seeds, options.iterations, options.seed, options.timeBudget,
+            memoryLimit, options.scale, options.outDir, options.minimize):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
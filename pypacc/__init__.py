@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+# pypacc: read the contents of PAC/FPC Closed Caption (subtitle) files.
+#
+#     import pypacc
+#     track = pypacc.parse('film.pac')          # or the bytes of a file
+#     for paragraph in track:
+#         print(paragraph)
+#
+# The PAC format was developed by Screen Electronics. This parser is based on
+# code written by Nikolaj Olsson under the GNU General Public License, see
+# <http://www.nikse.dk/SubtitleEdit/>. Released under the GNU General Public
+# License, version 3 or later (see LICENSE).
+
+
+from .errors import EncodingDetectionError, PacError, UnsupportedEncodingError
+from .parser import iterParagraphs, parse, readSubtitle
+from .track import Paragraph, SubtitleTrack, TimeCode
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+# On-disk cache of parsed files.
+
+
+import hashlib
+import os
+import struct
+import zlib
+
+from .codecs import (OUTPUT_ERRORS, STORED_ENCODING, STORED_ERRORS,
+                     normalizeRulesDigest)
+from .parser import PARSER_VERSION, STREAM_CHUNK_SIZE, paragraphsFrameRate
+from .timecode import MILLISECONDS, getFrameRate
+from .track import Paragraph, TimeCode
+
+
+# Default size limit of a ParseCache, in bytes
+CACHE_MAX_SIZE = 256 * 2 ** 20
+
+# ParseCache entries: magic, lengths of the encoding and frame rate names,
+# confidence and number of paragraphs, then the names and the zlib-compressed
+# paragraphs (start and end in milliseconds, text length, text). The frame
+# rate is that of the time codes the paragraphs were read from.
+CACHE_MAGIC = b'PAC3'
+CACHE_HEADER = struct.Struct('<4sBBdI')
+CACHE_PARAGRAPH = struct.Struct('<qqI')
+
+
+class ParseCache(object):
+    """
+    On-disk cache of parsed files, keyed by the hash of the file, the parser
+    version, the code page and the normalization rules. The hash of a file
+    is stored with its mtime and size, so unchanged files are not hashed
+    again. Least recently used entries are evicted once the cache grows past
+    maxSize bytes.
+    """
+
+    def __init__(self, directory, maxSize=CACHE_MAX_SIZE):
+        self.directory = directory
+        self.maxSize = maxSize
+        self.size = None  # Total size of the entries, counted on first save
+
+    def fileHash(self, subtitle_file):
+        """Return the sha1 of a file, rehashing only if it has changed"""
+
+        st = os.stat(subtitle_file)
+        stamp = '{0!r} {1}'.format(st.st_mtime, st.st_size)
+        path = os.path.abspath(subtitle_file)
+        stat_file = os.path.join(self.directory, 'stat',
+                                 hashlib.sha1(path.encode('utf-8',
+                                                          OUTPUT_ERRORS))
+                                 .hexdigest())
+        try:
+            with open(stat_file) as inf:
+                old_stamp, digest = inf.read().rsplit(' ', 1)
+            if old_stamp == stamp:
+                return digest
+        except (IOError, ValueError):
+            pass
+
+        sha1 = hashlib.sha1()
+        with open(subtitle_file, 'rb') as inf:
+            for chunk in iter(lambda: inf.read(STREAM_CHUNK_SIZE), b''):
+                sha1.update(chunk)
+        digest = sha1.hexdigest()
+        self.writeAtomic(stat_file, (stamp + ' ' + digest).encode('ascii'))
+        return digest
+
+    def entryPath(self, subtitle_file, codePage):
+        key = hashlib.sha1('{0} {1} {2} {3}'.format(
+            self.fileHash(subtitle_file), PARSER_VERSION, codePage,
+            normalizeRulesDigest().hex()).encode('utf-8'))
+        key = key.hexdigest()
+        return os.path.join(self.directory, 'entries', key[:2], key)
+
+    def load(self, subtitle_file, codePage):
+        """
+        Return the cached (paragraphs, encoding, confidence) of a file,
+        or None
+        """
+
+        path = self.entryPath(subtitle_file, codePage)
+        try:
+            with open(path, 'rb') as inf:
+                data = inf.read()
+            os.utime(path, None)  # Mark as recently used
+        except (IOError, OSError):
+            return None
+
+        try:
+            return unpackParagraphs(data)
+        except (struct.error, zlib.error, ValueError):
+            return None
+
+    def save(self, subtitle_file, codePage, paragraphs, encoding,
+             confidence):
+        """Cache the paragraphs of a file, evicting old entries if needed"""
+
+        path = self.entryPath(subtitle_file, codePage)
+        data = packParagraphs(paragraphs, encoding, confidence)
+        self.writeAtomic(path, data)
+
+        if self.size is None:
+            self.evict()
+        else:
+            self.size += len(data)
+            if self.size > self.maxSize:
+                self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries past maxSize"""
+
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(
+                os.path.join(self.directory, 'entries')):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:  # Evicted by another process
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+
+        self.size = sum(entry[1] for entry in entries)
+        for mtime, size, path in sorted(entries):
+            if self.size <= self.maxSize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.size -= size
+
+    def writeAtomic(self, path, data):
+        """Write a file so that readers never see it half written"""
+
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:  # Created by another process
+                if not os.path.isdir(directory):
+                    raise
+        tmp_file = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(tmp_file, 'wb') as outf:
+            outf.write(data)
+        os.rename(tmp_file, path)
+
+
+def getParseCache(directory, maxSize=CACHE_MAX_SIZE):
+    """Return the ParseCache of a directory, one per process"""
+
+    if directory not in PARSE_CACHES:
+        PARSE_CACHES[directory] = ParseCache(directory, maxSize)
+    return PARSE_CACHES[directory]
+
+
+PARSE_CACHES = {}
+
+
+def packParagraphs(paragraphs, encoding, confidence):
+    """
+    Pack paragraphs, with the encoding they were decoded with and its
+    confidence (or None), in the binary format of the parse cache
+    """
+
+    parts = []
+    for p in paragraphs:
+        text = p.text.encode(STORED_ENCODING, STORED_ERRORS)
+        parts.append(CACHE_PARAGRAPH.pack(p.startTime.totalMilliseconds,
+                                          p.endTime.totalMilliseconds,
+                                          len(text)))
+        parts.append(text)
+    if confidence is None:
+        confidence = -1.0
+    encoding = encoding.encode('ascii')
+    frameRate = paragraphsFrameRate(paragraphs, MILLISECONDS).name.encode(
+        'ascii')
+
+    return (CACHE_HEADER.pack(CACHE_MAGIC, len(encoding), len(frameRate),
+                              confidence, len(paragraphs)) +
+            encoding + frameRate + zlib.compress(b''.join(parts)))
+
+
+def unpackParagraphs(data):
+    """Unpack (paragraphs, encoding, confidence) packed by packParagraphs"""
+
+    magic, encodingLength, frameRateLength, confidence, count = \
+        CACHE_HEADER.unpack_from(data)
+    if magic != CACHE_MAGIC:
+        raise ValueError('Not a parse cache entry')
+    index = CACHE_HEADER.size
+    encoding = data[index:index + encodingLength].decode('ascii')
+    index += encodingLength
+    frameRate = data[index:index + frameRateLength].decode('ascii')
+    frameRate = (MILLISECONDS if frameRate == MILLISECONDS.name else
+                 getFrameRate(frameRate))
+    body = zlib.decompress(data[index + frameRateLength:])
+
+    # The times are frame counts again, at the rate they were read at
+    paragraphs = []
+    index = 0
+    framesFromMilliseconds = frameRate.framesFromMilliseconds
+    fromFrames = TimeCode.fromFrames
+    for i in range(count):
+        start, end, textLength = CACHE_PARAGRAPH.unpack_from(body, index)
+        index += CACHE_PARAGRAPH.size
+        text = body[index:index + textLength].decode(STORED_ENCODING,
+                                                     STORED_ERRORS)
+        paragraphs.append(Paragraph(
+            fromFrames(framesFromMilliseconds(start), frameRate),
+            fromFrames(framesFromMilliseconds(end), frameRate), text))
+        index += textLength
+    if confidence < 0:
+        confidence = None
+
+    return paragraphs, encoding, confidence
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+
+# Command line: converts a single file, or a batch of files with a pool of
+# worker processes.
+
+
+from optparse import OptionParser
+import cProfile
+import multiprocessing
+import os
+import sys
+import time
+
+from .cache import CACHE_MAX_SIZE, ParseCache, getParseCache
+from .codecs import OUTPUT_ENCODING, OUTPUT_ERRORS
+from .errors import PacError
+from .parser import DETECT_SAMPLE_SIZE, paragraphsFrameRate, readSubtitle
+from .stats import phaseTimer, startStats, stopStats
+from .timecode import (DEFAULT_FRAME_RATE, FRAME_RATE_AUTO, FRAME_RATES,
+                       frameRateOrder, getFrameRate)
+from .writers import WRITERS, getWriter, writeOut, writeOutFiles
+
+
+# Inserted before the extension of an output named after its input when both
+# have the same extension (PAC or FPC written next to the master)
+OUT_FILE_SUFFIX = '.out'
+
+
+def findSubtitleFiles(batch):
+    """
+    Return the PAC/FPC files under the directory batch, or listed in the
+    file batch (one per line), and the directory they are relative to
+    """
+
+    if os.path.isdir(batch):
+        subtitle_files = []
+        for dirpath, dirnames, filenames in os.walk(batch):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename[-4:].lower() in ('.pac', '.fpc'):
+                    subtitle_files.append(os.path.join(dirpath, filename))
+        return subtitle_files, batch
+
+    with open(batch) as inf:
+        subtitle_files = [line.strip() for line in inf if line.strip()]
+    root = os.path.commonprefix([os.path.dirname(os.path.abspath(f)) + os.sep
+                                 for f in subtitle_files])
+    return subtitle_files, os.path.dirname(root)
+
+
+def outFileName(subtitle_file, outForm):
+    """
+    Name the output of subtitle_file in outForm after it, with OUT_FILE_SUFFIX
+    if the format's extension is that of the input
+    """
+
+    base, extension = os.path.splitext(subtitle_file)
+    outExtension = getWriter(outForm).extension
+    if extension.lower() == outExtension:
+        base += OUT_FILE_SUFFIX
+    return base + outExtension
+
+
+def outputClash(jobs):
+    """
+    Return a message if an output of jobs, given as (subtitle_file,
+    out_files) pairs, would overwrite an input or another output, else None
+    """
+
+    def fileKey(path):
+        return os.path.normcase(os.path.realpath(path))
+
+    inputs = dict((fileKey(subtitle_file), subtitle_file)
+                  for subtitle_file, out_files in jobs)
+    written = {}
+    for subtitle_file, out_files in jobs:
+        for out_file in out_files:
+            key = fileKey(out_file)
+            if key in inputs:
+                return '{0} would overwrite the input {1}'.format(
+                    out_file, inputs[key])
+            if key in written:
+                return '{0} would be written for both {1} and {2}'.format(
+                    out_file, written[key], subtitle_file)
+            written[key] = subtitle_file
+    return None
+
+
+def batchOutFile(subtitle_file, root, outDir, outForm):
+    """
+    Name the output of subtitle_file, next to it or at the same place in a
+    mirror tree under outDir
+    """
+
+    if not outDir:
+        return outFileName(subtitle_file, outForm)
+    out_file = (os.path.splitext(subtitle_file)[0] +
+                getWriter(outForm).extension)
+    relative = os.path.relpath(os.path.abspath(out_file),
+                               os.path.abspath(root))
+    return os.path.join(outDir, relative)
+
+
+def convertFile(job):
+    """
+    Convert a single file in batch mode to each (format, out_file) of
+    outputs, return (subtitle_file, size, error message or None)
+    """
+
+    subtitle_file, outputs, codePage, sampleSize, cacheDir, cacheSize, \
+        frameRate, rich = job
+    try:
+        size = os.path.getsize(subtitle_file)
+        cache = cacheDir and getParseCache(cacheDir, cacheSize)
+        paragraphs = readSubtitle(subtitle_file, codePage, sampleSize, cache,
+                                  frameRate, rich)
+        for outForm, out_file in outputs:
+            out_dir = os.path.dirname(out_file)
+            if out_dir and not os.path.isdir(out_dir):
+                try:
+                    os.makedirs(out_dir)
+                except OSError:  # Created by another worker
+                    if not os.path.isdir(out_dir):
+                        raise
+        writeOutFiles(paragraphs, outputs,
+                      writerFrameRate(frameRate, paragraphs),
+                      codePage and codePage.lower())
+    except Exception as e:
+        return subtitle_file, 0, '{0}: {1}'.format(type(e).__name__, e)
+
+    return subtitle_file, size, None
+
+
+def writerFrameRate(frameRate, paragraphs):
+    """
+    Frame rate given to the writers: that of the time codes, the one
+    detected while reading the paragraphs with 'auto'
+    """
+
+    if frameRate == FRAME_RATE_AUTO:
+        return paragraphsFrameRate(paragraphs)
+    return frameRate
+
+
+def runBatch(batch, outDir, jobs, codePage, outForms, sampleSize,
+             cacheDir=None, cacheSize=CACHE_MAX_SIZE,
+             frameRate=DEFAULT_FRAME_RATE, rich=False):
+    """
+    Convert every file of a batch to each of outForms with a pool of jobs
+    processes (None: one per CPU, at most one per file), print a summary and
+    return the number of files that failed.
+    Raise PacError, before converting anything, if an output would overwrite
+    an input or another output.
+    """
+
+    subtitle_files, root = findSubtitleFiles(batch)
+    work = [(subtitle_file,
+             [(outForm, batchOutFile(subtitle_file, root, outDir, outForm))
+              for outForm in outForms],
+             codePage, sampleSize, cacheDir, cacheSize, frameRate, rich)
+            for subtitle_file in subtitle_files]
+    clash = outputClash([(job[0], [out_file for outForm, out_file in job[1]])
+                         for job in work])
+    if clash:
+        raise PacError(clash)
+
+    if jobs is None:
+        jobs = min(multiprocessing.cpu_count(), len(work))
+    jobs = max(jobs, 1)
+    start = time.time()
+    if jobs == 1:
+        results = map(convertFile, work)
+    else:
+        pool = multiprocessing.Pool(jobs)
+        results = pool.imap_unordered(convertFile, work, chunksize=4)
+
+    converted = 0
+    failed = 0
+    total_size = 0
+    for subtitle_file, size, error in results:
+        if error is None:
+            converted += 1
+            total_size += size
+        else:
+            failed += 1
+            print('{0}: {1}'.format(subtitle_file, error), file=sys.stderr)
+
+    if jobs != 1:
+        pool.close()
+        pool.join()
+    elapsed = max(time.time() - start, 1e-6)
+
+    print('{0} converted, {1} failed in {2:.2f}s '
+          '({3:.1f} files/s, {4:.2f} MB/s)'.format(
+              converted, failed, elapsed, (converted + failed) / elapsed,
+              total_size / elapsed / 1e6), file=sys.stderr)
+
+    return failed
+
+
+def main():
+    usage = "usage: python3 readPac.py [options] pac_file"
+    availableOutputs = sorted(outForm for outForm in WRITERS
+                              if outForm.isupper())
+    parser = OptionParser(usage=usage)
+    parser.add_option("-e", "--encoding", dest="codePage",help="encoding: latin, thai, chinese, cyrillic, utf-8")
+    parser.add_option("-t", "--text", action="store_true", dest="textOnly",help="Write out text only")
+    parser.add_option("-f", "--outformat", dest="outFormat", help="Define output format, options: " + ", ".join(availableOutputs) + " (several separated by commas)")
+    parser.add_option("-o", "--outfile", dest="outFile", help="Output to file, specify filename")
+    parser.add_option("-s", "--sample", dest="sampleSize", type="int", default=DETECT_SAMPLE_SIZE, help="Number of subtitles sampled to detect the encoding (0 for all), default: %default")
+    parser.add_option("-b", "--batch", dest="batch", help="Convert every PAC/FPC file in a directory, or listed in a file (one per line)")
+    parser.add_option("-d", "--outdir", dest="outDir", help="Batch mode: write outputs to a mirror tree under this directory instead of next to the inputs")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=None, help="Number of worker processes in batch mode, and decoding a large file, default: one per CPU up to the number of files in batch mode, 1 otherwise")
+    parser.add_option("-c", "--cache", dest="cacheDir", help="Cache parsed files in this directory")
+    parser.add_option("--cache-size", dest="cacheSize", type="int", default=CACHE_MAX_SIZE // 2 ** 20, help="Maximum size of the cache in MB, default: %default")
+    parser.add_option("--fps", dest="frameRate", default=DEFAULT_FRAME_RATE.name, help="Frame rate of the time codes: " + ", ".join(sorted(FRAME_RATES, key=frameRateOrder)) + ", or " + FRAME_RATE_AUTO + " to detect it, default: %default")
+    parser.add_option("--rich", action="store_true", dest="rich", help="Keep the position, alignment and format codes of the subtitles (written by VTT, TTML and STL)")
+    parser.add_option("--stats", action="store_true", dest="stats", help="Print parser statistics and phase timings to stderr")
+    parser.add_option("--profile", dest="profile", help="Write a cProfile dump of the conversion to this file")
+    (options, args) = parser.parse_args()
+    outForms = []
+    if options.outFormat:
+        outForms = [outForm.strip().upper()
+                    for outForm in options.outFormat.split(',')]
+    for outForm in outForms:
+        if outForm not in availableOutputs:
+            print("Invalid output format: " + outForm)
+            parser.print_help()
+            sys.exit(2)
+
+    frameRate = options.frameRate
+    if frameRate.lower() == FRAME_RATE_AUTO:
+        frameRate = FRAME_RATE_AUTO
+    else:
+        try:
+            frameRate = getFrameRate(frameRate)
+        except ValueError as e:
+            print(e)
+            sys.exit(2)
+
+    if options.textOnly:
+        outForms = ["text"]
+
+    if options.batch:
+        try:
+            failed = runBatch(options.batch, options.outDir,
+                              options.jobs, options.codePage,
+                              outForms or ["SRT"], options.sampleSize,
+                              options.cacheDir, options.cacheSize * 2 ** 20,
+                              frameRate, options.rich)
+        except PacError as e:
+            print(e)
+            sys.exit(2)
+        sys.exit(1 if failed else 0)
+    elif len(args) == 0:
+        parser.print_help()
+        sys.exit(1)
+    elif len(outForms) > 1 and not options.outFile and args[0] == '-':
+        print("Several output formats need an output file (-o)")
+        sys.exit(2)
+
+    # Several formats are written in one pass, to files named after -o or
+    # the input file
+    if len(outForms) > 1 and options.outFile:
+        base = os.path.splitext(options.outFile)[0]
+        outputs = [(outForm, base + getWriter(outForm).extension)
+                   for outForm in outForms]
+    elif len(outForms) > 1:
+        outputs = [(outForm, outFileName(args[0], outForm))
+                   for outForm in outForms]
+    else:
+        outputs = [(None, options.outFile)] if options.outFile else []
+    clash = args[0] != '-' and outputClash(
+        [(args[0], [out_file for outForm, out_file in outputs])])
+    if clash:
+        print(clash)
+        sys.exit(2)
+
+    sys.stdout.reconfigure(encoding=OUTPUT_ENCODING, errors=OUTPUT_ERRORS)
+    codePage = options.codePage and options.codePage.lower()
+
+    if options.stats:
+        startStats()
+    if options.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        ###Work out encoding & Read File
+        cache = None
+        if options.cacheDir:
+            cache = ParseCache(options.cacheDir, options.cacheSize * 2 ** 20)
+        paragraphs = readSubtitle(args[0], options.codePage,
+                                  options.sampleSize, cache, frameRate,
+                                  options.rich, max(options.jobs or 1, 1))
+
+        ##Determine outputs
+        ##print options.outFile 
+        with phaseTimer('write'):
+            if len(outForms) > 1:
+                writeOutFiles(paragraphs, outputs,
+                              writerFrameRate(frameRate, paragraphs),
+                              codePage)
+            elif outForms:
+                writeOut(paragraphs, outForms[0], options.outFile,
+                         writerFrameRate(frameRate, paragraphs), codePage)
+            else :
+                writeOut(paragraphs,"",options.outFile)
+    except PacError as e:
+        sys.stdout.flush()
+        print('{0}: {1}'.format(args[0], e), file=sys.stderr)
+        sys.exit(1)
+
+    if options.profile:
+        profiler.disable()
+        profiler.dump_stats(options.profile)
+    if options.stats:
+        print(stopStats().report(), file=sys.stderr)
@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+
+# Text decoders of the PAC code pages, and the normalization applied to the
+# decoded text. Code page tables are built the first time they are used.
+
+
+import hashlib
+import re
+
+from . import stats  # Registers the 'pacignore' error handler
+from .errors import UnsupportedEncodingError
+
+
+# Encoding of the output. Bytes the parser could not decode but passes through
+# (e.g. unmapped Cyrillic codes) are surrogate-escaped and written unchanged.
+OUTPUT_ENCODING = 'utf-8'
+OUTPUT_ERRORS = 'surrogateescape'
+
+# Encoding of the text kept by the parse cache and the block indexes. The
+# surrogate escapes of passed through bytes are stored as surrogates, so they
+# read back as they were and not as the character two of them may form.
+STORED_ENCODING = 'utf-8'
+STORED_ERRORS = 'surrogatepass'
+
+# Surrogate escapes of the bytes passed through by the decoders
+ESCAPED_BYTE_RE = re.compile('[\udc80-\udcff]')
+
+
+# Replacements made by normalizeText
+NORMALIZE_RULES = {'çs': 'š', 'çS': 'Š', 'çz': 'ž',
+                   'çZ': 'Ž', 'çc': 'č', 'çC': 'Č',
+                   '€': '', '，': '', '？': '', '…': ''}
+
+# Joins the paragraphs normalized by normalizeTexts
+NORMALIZE_SEPARATOR = '\x00'
+
+# Digest of NORMALIZE_RULES, built by normalizeRulesDigest
+NORMALIZE_DIGEST = None
+
+
+def compileNormalizeRules(rules):
+    """
+    Compile a regex matching any of the rules, longest first, with a
+    capturing group so that split() keeps the matches
+    """
+
+    keys = sorted(rules, key=len, reverse=True)
+    return re.compile('(' + '|'.join(map(re.escape, keys)) + ')')
+
+
+NORMALIZE_RE = compileNormalizeRules(NORMALIZE_RULES)
+
+
+def addNormalizeRules(rules):
+    """
+    Register extra replacements for normalizeText, given as a dict of
+    {text: replacement} (str or utf-8 bytes)
+    """
+
+    global NORMALIZE_RE, NORMALIZE_DIGEST, LATIN_ENCODING
+
+    for old, new in rules.items():
+        if isinstance(old, bytes):
+            old = old.decode('utf-8')
+        if isinstance(new, bytes):
+            new = new.decode('utf-8')
+        if not old or NORMALIZE_SEPARATOR in old:
+            raise ValueError('Invalid normalization rule: %r' % old)
+        NORMALIZE_RULES[old] = new
+
+    NORMALIZE_RE = compileNormalizeRules(NORMALIZE_RULES)
+    # Rebuilt from the new rules when next used
+    NORMALIZE_DIGEST = None
+    LATIN_ENCODING = None
+
+
+def normalizeRulesDigest():
+    """
+    Return the sha1 digest of the normalization rules, which the text kept
+    by the parse cache and the block indexes depends on
+    """
+
+    global NORMALIZE_DIGEST
+
+    if NORMALIZE_DIGEST is None:
+        NORMALIZE_DIGEST = hashlib.sha1(
+            repr(sorted(NORMALIZE_RULES.items())).encode('utf-8')).digest()
+
+    return NORMALIZE_DIGEST
+
+
+def normalizeText(text):
+    """Some simple text normalization"""
+
+    # Every other item is a match, replaced without a Python callback
+    parts = NORMALIZE_RE.split(text)
+    parts[1::2] = map(NORMALIZE_RULES.__getitem__, parts[1::2])
+
+    return ''.join(parts)
+
+
+def normalizeTexts(texts):
+    """Normalize a list of texts in a single pass"""
+
+    joined = NORMALIZE_SEPARATOR.join(texts)
+    if joined.count(NORMALIZE_SEPARATOR) != len(texts) - 1:
+        return list(map(normalizeText, texts))
+
+    return normalizeText(joined).split(NORMALIZE_SEPARATOR) if texts else []
+
+
+def decodeBig5(byte_list):
+    """
+    Given a 2-byte sequence,
+    return big5 char (invalid bytes are passed through as surrogates)
+    """
+
+    return byte_list.decode('big5', OUTPUT_ERRORS)
+
+
+def buildCyrillicTables():
+    """
+    Build the byte -> letter table and the table of two-byte codes from
+    CyrillicCodes/CyrillicLetters, keyed by bytes
+    """
+
+    from .cyrillic import CyrillicCodes, CyrillicLetters
+
+    byteTable = {}
+    pairTable = {}
+    for code, letter in reversed(list(zip(CyrillicCodes, CyrillicLetters))):
+        if len(code) == 1:
+            byteTable[code.encode('latin-1')] = letter
+        else:
+            # e.g. '\xe065' is the two-byte code 0xe0 0x65
+            if code[0] not in CyrillicCodes:
+                pair = bytes([ord(code[0]), int(code[1:], 16)])
+                pairTable[pair] = letter
+
+    return byteTable, pairTable
+
+
+def buildCyrillicTranslation(byteTable):
+    """
+    Build the str.translate table of latin-1 decoded Cyrillic text. Bytes
+    without a letter are passed through unchanged (high bytes as surrogate
+    escapes).
+    """
+
+    table = dict((i, chr(0xdc00 + i)) for i in range(0x80, 0x100))
+    for code, letter in byteTable.items():
+        table[ord(code)] = letter
+
+    return table
+
+
+# Built by loadCyrillicTables when Cyrillic text is first decoded
+CYRILLIC_TABLE = None
+CYRILLIC_TRANSLATION = None
+CYRILLIC_PAIRS = None
+CYRILLIC_PAIR_RE = None
+
+# Bytes that are control codes in PAC text, never written as text
+PAC_TEXT_CONTROLS = (0xfe, 0xff)
+
+# Built by the encoders when text is first encoded
+CYRILLIC_ENCODING = None
+LATIN_ENCODING = None
+
+
+def loadCyrillicTables():
+    """Build the Cyrillic tables, return the code -> letter table"""
+
+    global CYRILLIC_TABLE, CYRILLIC_TRANSLATION, CYRILLIC_PAIRS, \
+        CYRILLIC_PAIR_RE
+
+    if CYRILLIC_TABLE is None:
+        byteTable, pairTable = buildCyrillicTables()
+        table = dict(byteTable)
+        table.update(pairTable)
+        CYRILLIC_PAIRS = dict((pair.decode('latin-1'), letter)
+                              for pair, letter in pairTable.items())
+        CYRILLIC_PAIR_RE = re.compile('|'.join(map(re.escape,
+                                                   CYRILLIC_PAIRS)))
+        CYRILLIC_TRANSLATION = buildCyrillicTranslation(byteTable)
+        CYRILLIC_TABLE = table
+
+    return CYRILLIC_TABLE
+
+
+def decodeLatin(text_bytes):
+    """Decode a run of iso-8859-1 text"""
+
+    return text_bytes.decode('iso-8859-1')
+
+
+def decodeThai(text_bytes):
+    """Decode a run of cp874 text"""
+
+    return text_bytes.decode('cp874', 'pacignore')
+
+
+def cyrillicPair(match):
+    return CYRILLIC_PAIRS[match.group()]
+
+
+def decodeCyrillic(text_bytes):
+    """Decode a run of Cyrillic text"""
+
+    if CYRILLIC_TRANSLATION is None:
+        loadCyrillicTables()
+
+    # Two-byte codes become letters outside latin-1, left alone by translate
+    text = CYRILLIC_PAIR_RE.sub(cyrillicPair, text_bytes.decode('latin-1'))
+    return text.translate(CYRILLIC_TRANSLATION)
+
+
+def decodeUTF8(text_bytes):
+    """Decode a run of utf-8 text, dropping invalid bytes and 0x1f codes"""
+
+    text_bytes = text_bytes.replace(b'\x1f', b'')
+    return text_bytes.decode('utf-8', 'pacignore')
+
+
+def decodeNothing(text_bytes):
+    return ''
+
+
+def decodeUnsupported(text_bytes):
+    if text_bytes:
+        raise UnsupportedEncodingError('Not currently supported')
+    return ''
+
+
+def cyrillicEncoding():
+    """
+    Build the str.translate table of text to Cyrillic codes (as latin-1
+    characters), the inverse of the decoding tables: letters get their one
+    byte code, or their two-byte code if they have no one byte code.
+    Surrogate-escaped bytes are written back, and characters that would not
+    decode to themselves become '?'.
+    """
+
+    global CYRILLIC_ENCODING
+
+    if CYRILLIC_ENCODING is None:
+        table = loadCyrillicTables()
+        encoding = dict((i, '?') for i in range(0x80, 0x100))
+        for code in table:
+            if len(code) == 1 and code[0] < 0x80:
+                encoding.setdefault(code[0], '?')
+        for code in sorted(table, key=lambda code: (len(code), code)):
+            letter = table[code]
+            if len(letter) == 1 and encoding.get(ord(letter)) in (None, '?'):
+                encoding[ord(letter)] = code.decode('latin-1')
+        for i in range(0x80, 0x100):
+            encoding[0xdc00 + i] = chr(i)
+        for control in PAC_TEXT_CONTROLS:
+            encoding[0xdc00 + control] = '?'
+        CYRILLIC_ENCODING = encoding
+
+    return CYRILLIC_ENCODING
+
+
+def latinEncoding():
+    """
+    Build the str.translate table of text to iso-8859-1, writing the
+    letters normalizeText makes of two characters back as two characters
+    """
+
+    global LATIN_ENCODING
+
+    if LATIN_ENCODING is None:
+        encoding = dict((control, '?') for control in PAC_TEXT_CONTROLS)
+        for old, new in NORMALIZE_RULES.items():
+            if len(new) == 1 and ord(new) > 0xff and \
+                    max(map(ord, old)) <= 0xff:
+                encoding[ord(new)] = old
+        LATIN_ENCODING = encoding
+
+    return LATIN_ENCODING
+
+
+def encodeLatin(text):
+    """Encode text as iso-8859-1"""
+
+    return text.translate(latinEncoding()).encode('iso-8859-1', 'replace')
+
+
+def encodeThai(text):
+    """Encode text as cp874"""
+
+    return text.encode('cp874', 'replace')
+
+
+def encodeCyrillic(text):
+    """Encode text with the Cyrillic codes"""
+
+    return text.translate(cyrillicEncoding()).encode('latin-1', 'replace')
+
+
+def encodeUTF8(text):
+    """Encode text as utf-8, writing surrogate-escaped bytes back"""
+
+    return text.encode('utf-8', OUTPUT_ERRORS)
+
+
+def encodeBig5(text):
+    """
+    Encode text as W16 characters: big5 characters, and ascii characters
+    after a 0x00 byte
+    """
+
+    out = bytearray()
+    for char in text:
+        if char < '\x80':
+            out += b'\x00' + char.encode('ascii')
+        else:
+            try:
+                code = char.encode('big5')
+            except UnicodeEncodeError:
+                code = b'\x00?'
+            out += code
+    return bytes(out)
+
+
+TEXT_DECODERS = {'latin': decodeLatin,
+                 'arabic': decodeUnsupported,
+                 'hebrew': decodeUnsupported,
+                 'cyrillic': decodeCyrillic,
+                 'thai': decodeThai,
+                 'utf-8': decodeUTF8,
+                 'utf8': decodeUTF8}
+
+
+def getTextDecoder(codePage):
+    """
+    Return the function decoding runs of text for codePage
+    (text in unknown code pages is dropped)
+    """
+
+    return TEXT_DECODERS.get(codePage, decodeNothing)
+
+
+# Encoders of the code pages a PAC file can be written in. Chinese text is
+# written in W16 blocks.
+TEXT_ENCODERS = {'latin': encodeLatin,
+                 'cyrillic': encodeCyrillic,
+                 'thai': encodeThai,
+                 'chinese': encodeBig5,
+                 'utf-8': encodeUTF8,
+                 'utf8': encodeUTF8}
+
+
+def getTextEncoder(codePage):
+    """Return the function encoding text for codePage"""
+
+    try:
+        return TEXT_ENCODERS[codePage]
+    except KeyError:
+        raise UnsupportedEncodingError(
+            'Cannot write the encoding: {0}'.format(codePage))
+
+
+def guessCodePage(texts):
+    """
+    Return the code page to write texts in, from the script of their
+    letters: chinese, cyrillic, thai, or latin
+    """
+
+    for text in texts:
+        for char in text:
+            if char < '\u0400':
+                continue
+            if '\u4e00' <= char <= '\u9fff':
+                return 'chinese'
+            if '\u0400' <= char <= '\u04ff':
+                return 'cyrillic'
+            if '\u0e01' <= char <= '\u0e5b':
+                return 'thai'
+    return 'latin'
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+
+# Cyrillic code page of PAC files: the letter of each byte code, and of the
+# two-byte codes written as the lead byte followed by the hex of the second
+# byte (e.g. '\xe065'). Only imported once Cyrillic text is decoded.
+
+
+CyrillicLetters = [" ",  # 0x20
+                   "!",  # 0x21
+                   "Э",  # 0x22
+                   "/",  # 0x23
+                   "?",  # 0x24
+                   ":",  # 0x25
+                   ".",  # 0x26
+                   "э",  # 0x27
+                   "(",  # 0x28
+                   ")",  # 0x29
+                   ",",  # 0x2c
+                   "_",  # 0x2d
+                   "ю",  # 0x2e
+                   ">",  # 0x3c
+                   "Ф",  # 0x41
+                   "И",  # 0x42
+                   "C",  # 0x43
+                   "B",  # 0x44
+                   "У",  # 0x45
+                   "F",  # 0x46
+                   "Р",  # 0x48
+                   "Ш",  # 0x49
+                   "О",  # 0x4a
+                   "Ь",  # 0x4d
+                   "Т",  # 0x4e
+                   "Ы",  # 0x53
+                   "Ц",  # 0x57
+                   "Ч",  # 0x58
+                   "Я",  # 0x5a
+                   "х",  # 0x5b
+                   "ъ",  # 0x5d
+                   ",",  # 0x5e
+                   "-",  # 0x5f
+                   "ф",  # 0x61
+                   "и",  # 0x62
+                   "с",  # 0x63
+                   "в",  # 0x64
+                   "у",  # 0x65
+                   "a",  # 0x66
+                   "п",  # 0x67
+                   "p",  # 0x68
+                   "ш",  # 0x69
+                   "д",  # 0x6c
+                   "ь",  # 0x6d
+                   "т",  # 0x6e
+                   "э",  # 0x6f
+                   "з",  # 0x70
+                   "ы",  # 0x73
+                   "e",  # 0x74
+                   "г",  # 0x75
+                   "ц",  # 0x77
+                   "ч",  # 0x78
+                   "н",  # 0x79
+                   "я",  # 0x7a
+                   "Х",  # 0x7b
+                   "Ъ",  # 0x7d
+                   "Ю",  # 0x81
+                   "ђ",  # 0x92
+                   ",",  # 0x94
+                   "-",  # 0x95
+                   "і",  # 0x96
+                   "ј",  # 0x98
+                   "љ",  # 0x99
+                   "ћ",  # 0x9b
+                   "њ",  # 0x9a
+                   "§",  # 0x9d
+                   "џ",  # 0x9f
+                   "C",  # 0xac
+                   "D",  # 0xad
+                   "E",  # 0xae
+                   "F",  # 0xaf
+                   "G",  # 0xb0
+                   "H",  # 0xb1
+                   "'",  # 0xb2
+                   '"',  # 0xb3
+                   "I",  # 0xb4
+                   "J",  # 0xb5
+                   "K",  # 0xb6
+                   "L",  # 0xb7
+                   "M",  # 0xb8
+                   "N",  # 0xb9
+                   "P",  # 0xba
+                   "Q",  # 0xbb
+                   "R",  # 0xbc
+                   "S",  # 0xbd
+                   "T",  # 0xbe
+                   "U",  # 0xbf
+                   "V",  # 0xc0
+                   "W",  # 0xc2
+                   "X",  # 0xc3
+                   "Y",  # 0xc4
+                   "Z",  # 0xc5
+                   "b",  # 0xc6
+                   "c",  # 0xc7
+                   "d",  # 0xc8
+                   "e",  # 0xc9
+                   "f",  # 0xca
+                   "g",  # 0xcb
+                   "h",  # 0xcc
+                   "i",  # 0xcd
+                   "j",  # 0xce
+                   "k",  # 0xcf
+                   "l",  # 0xd1
+                   "m",  # 0xd2
+                   "n",  # 0xd3
+                   "o",  # 0xd4
+                   "p",  # 0xd5
+                   "q",  # 0xd6
+                   "r",  # 0xd7
+                   "s",  # 0xd8
+                   "t",  # 0xd9
+                   "u",  # 0xda
+                   "v",  # 0xdb
+                   "w",  # 0xdc
+                   "э",  # 0xdd
+                   "ю",  # 0xde
+                   "z",  # 0xdf
+                   "ў",  # 0xe065
+                   "ё",  # 0xe574
+                   "ќ",  # 0xe272
+                   "ѓ",  # 0xe275
+                   "ї",  # 0xe596
+                   "ш"]  # 0x6938
+
+CyrillicCodes = ['\x20',  # space
+                 '\x21',  # !
+                 '\x22',  # Э
+                 '\x23',  # /
+                 '\x24',  # ?
+                 '\x25',  # :
+                 '\x26',  # .
+                 '\x27',  # э
+                 '\x28',  # (
+                 '\x29',  # )
+                 '\x2c',  # ,
+                 '\x2d',  # _
+                 '\x2e',  # ю
+                 '\x3c',  # >
+                 '\x41',  # Ф
+                 '\x42',  # И
+                 '\x43',  # C
+                 '\x44',  # В
+                 '\x45',  # У
+                 '\x46',  # F
+                 '\x48',  # Р
+                 '\x49',  # Ш
+                 '\x4a',  # О
+                 '\x4d',  # Ь
+                 '\x4e',  # Т
+                 '\x53',  # Ы
+                 '\x57',  # Ц
+                 '\x58',  # Ч
+                 '\x5a',  # Я
+                 '\x5b',  # х
+                 '\x5d',  # ъ
+                 '\x5e',  # ,
+                 '\x5f',  # -
+                 '\x61',  # ф
+                 '\x62',  # и
+                 '\x63',  # c
+                 '\x64',  # в
+                 '\x65',  # у
+                 '\x66',  # a
+                 '\x67',  # п
+                 '\x68',  # p
+                 '\x69',  # ш
+                 '\x6c',  # д
+                 '\x6d',  # ь
+                 '\x6e',  # т
+                 '\x6f',  # э
+                 '\x70',  # з
+                 '\x73',  # ы
+                 '\x74',  # e
+                 '\x75',  # г
+                 '\x77',  # ц
+                 '\x78',  # ч
+                 '\x79',  # н
+                 '\x7a',  # я
+                 '\x7b',  # Х
+                 '\x7d',  # Ъ
+                 '\x81',  # Ю
+                 '\x92',  # ђ
+                 '\x94',  # ,
+                 '\x95',  # -
+                 '\x96',  # і
+                 '\x98',  # ј
+                 '\x99',  # љ
+                 '\x9a',  # њ
+                 '\x9b',  # ћ
+                 '\x9d',  # §
+                 '\x9f',  # џ
+                 '\xac',  # C
+                 '\xad',  # D
+                 '\xae',  # E
+                 '\xaf',  # F
+                 '\xb0',  # G
+                 '\xb1',  # H
+                 '\xb2',  # '
+                 '\xb3',  # "
+                 '\xb4',  # I
+                 '\xb5',  # J
+                 '\xb6',  # K
+                 '\xb7',  # L
+                 '\xb8',  # M
+                 '\xb9',  # N
+                 '\xba',  # P
+                 '\xbb',  # Q
+                 '\xbc',  # R
+                 '\xbd',  # S
+                 '\xbe',  # T
+                 '\xbf',  # U
+                 '\xc0',  # V
+                 '\xc2',  # W
+                 '\xc3',  # X
+                 '\xc4',  # Y
+                 '\xc5',  # Z
+                 '\xc6',  # b
+                 '\xc7',  # c
+                 '\xc8',  # d
+                 '\xc9',  # e
+                 '\xca',  # f
+                 '\xcb',  # g
+                 '\xcc',  # h
+                 '\xcd',  # i
+                 '\xce',  # j
+                 '\xcf',  # k
+                 '\xd1',  # l
+                 '\xd2',  # m
+                 '\xd3',  # n
+                 '\xd4',  # o
+                 '\xd5',  # p
+                 '\xd6',  # q
+                 '\xd7',  # r
+                 '\xd8',  # s
+                 '\xd9',  # t
+                 '\xda',  # u
+                 '\xdb',  # v
+                 '\xdc',  # w
+                 '\xdd',  # э
+                 '\xde',  # ю
+                 '\xdf',  # z
+                 '\xe065',  # ў
+                 '\xe574',  # ё
+                 '\xe272',  # ќ
+                 '\xe275',  # ѓ
+                 '\xe596',  # ї
+                 '\x6938']  # ш
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+# Character encoding detection: the first subtitles of a file are decoded with
+# each candidate code page and scored against the unicode block of its script.
+
+
+import itertools
+import re
+import string
+
+from . import stats
+from .codecs import ESCAPED_BYTE_RE
+from .errors import EncodingDetectionError
+from .parser import (DETECT_SAMPLE_SIZE, decodePacBlocks, iterPacBlocks,
+                     resolveFrameRate, uniqueParagraphs)
+from .stats import phaseTimer
+from .timecode import DEFAULT_FRAME_RATE
+
+
+# Encodings tried by autoDetect, as (unicode block, code page) pairs.
+# Chinese is detected regardless of specified encoding, so it reuses the
+# Thai decode. DO NOT CHANGE THIS ORDER
+DETECT_ENCODINGS = [('chinese', 'thai'),
+                    ('thai', 'thai'),
+                    ('cyrillic', 'cyrillic'),
+                    ('latin', 'latin')]
+
+# Characters ignored when checking the encoding of a paragraph
+IGNORED_CHARS = string.punctuation + string.digits + ' '
+IGNORED_RE = re.compile('[{0}]'.format(re.escape(IGNORED_CHARS)))
+
+# Paragraphs without a match have no letters at all
+LETTER_RE = re.compile('[^{0}]'.format(re.escape(IGNORED_CHARS)))
+
+# Fraction of the paragraphs that must be in the unicode block of a script
+DETECT_MIN_CONFIDENCE = 0.9
+
+# Fraction of the letters of a long paragraph that must be in the block
+PARAGRAPH_MIN_RATIO = 0.90
+
+# Unicode block of each script, the length under which all the letters of a
+# paragraph must be in it, and the letters a paragraph in the script is
+# usually written with. Latin letters are alphabetic characters, some of
+# which must be in the Latin-1 (ASCII) block.
+SCRIPT_BLOCKS = [('chinese', '\u4e00', '\u9fff', 3, None),
+                 ('thai', '\u0e01', '\u0e5b', 10, None),
+                 ('cyrillic', '\u0400', '\u04ff', 10, None),
+                 ('latin', '\u0000', '\u007f', 10,
+                  'A-Za-z\u00c0-\u00d6\u00d8-\u00f6\u00f8-\u017f')]
+
+
+def scriptClasses(start, end, shortLength, letters=None):
+    """
+    Return the character classes of a script: its block, the characters
+    other than the usual letters and ignored characters (paragraphs without
+    any are in the script, without counting) and shortLength
+    """
+
+    block = '{0}-{1}'.format(re.escape(start), re.escape(end))
+    return (re.compile('[{0}]'.format(block)),
+            re.compile('[^{0}{1}]'.format(re.escape(IGNORED_CHARS),
+                                         letters or block)),
+            shortLength)
+
+
+# Paragraphs of latin letters with one of these have some Latin-1 letters
+ASCII_LETTER_RE = re.compile('[A-Za-z]')
+
+SCRIPT_CLASSES = dict((blocks[0], scriptClasses(*blocks[1:]))
+                      for blocks in SCRIPT_BLOCKS)
+
+
+def isTarget(correct, paragraphs, min_thresh):
+    if float(correct) / paragraphs > min_thresh:
+        return True
+    else:
+        return False
+
+
+def scoreTexts(texts, lang, threshold=None):
+    """
+    Count the texts in the unicode block of lang, stopping once isTarget is
+    decided for threshold if given. Return the count and the number of texts
+    counted.
+    """
+
+    if not all(map(LETTER_RE.search, texts)):
+        raise EncodingDetectionError(
+            "Could not determine character encoding from file")
+
+    blockRE, otherRE, shortLength = SCRIPT_CLASSES[lang]
+    total = len(texts)
+    correct = 0
+    for counted, text in enumerate(texts):
+        if threshold is not None:
+            if isTarget(correct, total, threshold) or \
+                    not isTarget(correct + total - counted, total, threshold):
+                return correct, counted
+
+        if otherRE.search(text) is None:
+            # Nothing but ignored characters and letters of the script
+            if lang != 'latin' or ASCII_LETTER_RE.search(text):
+                correct += 1
+            continue
+
+        # Bytes passed through undecoded are not text in any block
+        if ESCAPED_BYTE_RE.search(text):
+            if stats.STATS is not None:
+                stats.STATS.decodeErrors += 1
+            continue
+
+        if lang == 'latin':
+            # Assume that a valid latin string will contain *some* latin_1
+            # chars, so if no latin_1 chars are found, assume invalid string
+            text = IGNORED_RE.sub('', text)
+            if not blockRE.search(text):
+                continue
+            letters = sum(map(str.isalpha, text))
+            length = len(text)
+        else:
+            letters = len(blockRE.findall(text))
+            length = len(text) - len(IGNORED_RE.findall(text))
+
+        ratio = float(letters) / length
+        if length < shortLength:  # For short text, must be 100% accurate
+            isLang = ratio == 1.0
+        else:
+            isLang = ratio >= PARAGRAPH_MIN_RATIO
+        if isLang:
+            correct += 1
+
+    return correct, total
+
+
+def autoDetect(subtitle_file, sampleSize=DETECT_SAMPLE_SIZE,
+               frameRate=DEFAULT_FRAME_RATE, rich=False, jobs=1):
+    """
+    Automatically detect character encoding.
+    Return the paragraphs, the detected encoding and its confidence
+    (large files are decoded by jobs processes once it is detected)
+    """
+
+    with phaseTimer('read'):
+        with open(subtitle_file, 'rb') as inf:
+            real_bytes = inf.read()
+
+    if jobs != 1:
+        from .parallel import PARALLEL_MIN_SIZE, loadParallel
+        if len(real_bytes) >= PARALLEL_MIN_SIZE:
+            frameRate = resolveFrameRate(frameRate, real_bytes)
+            sample = list(itertools.islice(iterPacBlocks(real_bytes),
+                                           sampleSize or None))
+            lang, codePage, confidence = scoreSample(sample, real_bytes,
+                                                     frameRate, rich)[:3]
+            del real_bytes
+            return (loadParallel(subtitle_file, codePage, frameRate, rich,
+                                 jobs), lang, confidence)
+
+    return detectEncoding(real_bytes, sampleSize, frameRate, rich)
+
+
+def detectEncoding(real_bytes, sampleSize=DETECT_SAMPLE_SIZE,
+                   frameRate=DEFAULT_FRAME_RATE, rich=False):
+    """
+    Decode the first sampleSize blocks with various encodings and compare
+    decoded text with unicode character blocks (using scoreSample()). The
+    rest of the file is only decoded with the winning encoding.
+    Return the paragraphs, the detected encoding and its confidence
+    (the fraction of sampled paragraphs in range). With rich, the
+    paragraphs are RichParagraphs.
+    """
+
+    frameRate = resolveFrameRate(frameRate, real_bytes)
+    blocks = iterPacBlocks(real_bytes)
+    sample = list(itertools.islice(blocks, sampleSize or None))
+
+    lang, codePage, confidence, decoded = scoreSample(sample, real_bytes,
+                                                      frameRate, rich)
+
+    rest = decodePacBlocks(blocks, real_bytes, codePage, frameRate, rich)
+    paragraphs = uniqueParagraphs(itertools.chain(decoded, rest))
+
+    return paragraphs, lang, confidence
+
+
+def scoreSample(sample, real_bytes, frameRate=DEFAULT_FRAME_RATE, rich=False):
+    """
+    Decode the sample blocks with each candidate code page in turn, falling
+    back to utf-8. Return the detected encoding, its code page, its
+    confidence and the sample's paragraphs decoded with the code page.
+    """
+
+    decoded = {}
+    for lang, codePage in DETECT_ENCODINGS:
+        if codePage not in decoded:
+            decoded[codePage] = list(decodePacBlocks(sample, real_bytes,
+                                                     codePage, frameRate,
+                                                     rich))
+        texts = [entry.text for entry in uniqueParagraphs(decoded[codePage])]
+        if not texts:
+            continue
+        with phaseTimer('detect'):
+            correct, counted = scoreTexts(texts, lang, DETECT_MIN_CONFIDENCE)
+            if isTarget(correct, len(texts), DETECT_MIN_CONFIDENCE):
+                # Count the rest for the exact confidence
+                correct += scoreTexts(texts[counted:], lang)[0]
+                confidence = float(correct) / len(texts)
+                break
+    else:
+        # Try UTF-8 as last resort:
+        if stats.STATS is not None:
+            stats.STATS.encodingFallbacks += 1
+        lang = codePage = 'utf-8'
+        decoded[codePage] = list(decodePacBlocks(sample, real_bytes, codePage,
+                                                 frameRate, rich))
+        confidence = 0.0
+
+    return lang, codePage, confidence, decoded[codePage]
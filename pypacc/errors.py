@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+
+# Exceptions raised by pypacc instead of exiting, so that the parser can be
+# embedded in long-running programs. The command line reports them and exits.
+
+
+class PacError(Exception):
+    """Base class of the errors raised by pypacc"""
+
+
+class UnsupportedEncodingError(PacError):
+    """Text in a code page the parser cannot decode (arabic, hebrew)"""
+
+
+class EncodingDetectionError(PacError):
+    """The character encoding of a file could not be determined"""
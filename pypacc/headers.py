@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+# Vectorized reading of block headers with NumPy, for timing analysis of large
+# archives: the time codes of every block of a file, without decoding any text.
+# NumPy is only needed by this module.
+
+
+import mmap
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError('pypacc.headers needs NumPy (pip install numpy)')
+
+from .timecode import (DEFAULT_FRAME_RATE, FRAME_RATE_AUTO, detectFrameRate,
+                       getFrameRate)
+
+
+# Fields of the arrays returned by readHeaders: start and end frame counts,
+# offset of the block's 0xFE marker and text length
+HEADER_DTYPE = np.dtype([('start', np.int64),
+                         ('end', np.int64),
+                         ('marker', np.int64),
+                         ('textLength', np.int64)])
+
+# Bytes searched for 0xFE markers at a time, bounding the temporary masks
+HEADER_SCAN_CHUNK = 2 ** 24
+
+
+def findMarkers(data):
+    """
+    Return the offsets of the 0xFE markers findPacBlock accepts with a 0x60
+    header 15 or 12 bytes before them (findPacBlock also stops at 0x61,
+    which getPacBlock rejects), and whether there is one at 15 and at 12
+    """
+
+    # findPacBlock looks from byte 16 up to 20 bytes before the end
+    end = len(data) - 20
+    markers = []
+    for start in range(16, max(end, 16), HEADER_SCAN_CHUNK):
+        chunk = data[start:min(start + HEADER_SCAN_CHUNK, end)]
+        markers.append(np.flatnonzero(chunk == 0xfe) + start)
+    markers = np.concatenate(markers) if markers else np.zeros(0, np.int64)
+
+    at15 = data[markers - 15] == 0x60
+    at12 = data[markers - 12] == 0x60
+    valid = at15 | at12
+    return markers[valid], at15[valid], at12[valid]
+
+
+def headerWords(data, timeStarts, offset):
+    """Gather the little-endian word at offset from each header"""
+
+    index = timeStarts + offset
+    return data[index].astype(np.int64) | data[index + 1].astype(np.int64) << 8
+
+
+def chainBlocks(data, markers, at15, at12):
+    """
+    Return the markers of the blocks iterPacBlocks finds among those of
+    findMarkers, with the offsets of their headers and their text lengths.
+    Scanning resumes after the text of each block, and the next header
+    cannot start before that, so markers inside a text (line breaks with a
+    0x60 byte before them) or inside a header are not blocks.
+    """
+
+    timeStarts = np.where(at15, markers - 15, markers - 12)
+    textLengths = headerWords(data, timeStarts, 9)
+    resume = np.maximum(timeStarts + 10 + textLengths, markers) + 1
+
+    # The block after each is at the first marker whose header 12 or 15 bytes
+    # before it is at the resume point or after
+    count = len(markers)
+    numbers = np.arange(count + 1)
+    following = np.minimum(
+        np.append(numbers[:-1][at12], count)[
+            np.searchsorted(markers[at12], resume + 12)],
+        np.append(numbers[:-1][at15], count)[
+            np.searchsorted(markers[at15], resume + 15)])
+    chain = numbers[:-1]
+    if not np.array_equal(following, numbers[1:]):
+        chain = []
+        following = following.tolist()
+        i = 0
+        while i < count:
+            chain.append(i)
+            i = following[i]
+
+    # A block whose header 15 bytes before its marker is before the resume
+    # point has it 12 bytes before, and ends elsewhere: such files are
+    # scanned one marker at a time
+    previous = np.concatenate([[0], resume[chain][:-1]])
+    if (at15[chain] & (markers[chain] - 15 < previous)).any():
+        return scanBlocks(data, markers, at15, at12)
+    return markers[chain], timeStarts[chain], textLengths[chain]
+
+
+def scanBlocks(data, markers, at15, at12):
+    """chainBlocks one marker at a time, as iterPacBlocks scans"""
+
+    found = ([], [], [])
+    start = 0
+    for marker, header15, header12 in zip(markers.tolist(), at15.tolist(),
+                                          at12.tolist()):
+        if header15 and marker - 15 >= start:
+            timeStart = marker - 15
+        elif header12 and marker - 12 >= start:
+            timeStart = marker - 12
+        else:
+            continue
+        textLength = int(data[timeStart + 9]) | int(data[timeStart + 10]) << 8
+        for column, value in zip(found, (marker, timeStart, textLength)):
+            column.append(value)
+        start = max(timeStart + 10 + textLength, marker) + 1
+    return tuple(np.array(column, dtype=np.int64) for column in found)
+
+
+def framesFromPac(high, low, frameRate):
+    """FrameRate.framesFromPac of arrays of time code words"""
+
+    hours, minutes = np.divmod(high, 100)
+    seconds, frames = np.divmod(low % 10000, 100)
+    totalMinutes = hours * 60 + minutes
+    frames += (totalMinutes * 60 + seconds) * frameRate.base
+    if frameRate.dropFrame:
+        frames -= 2 * (totalMinutes - totalMinutes // 10)
+    return frames
+
+
+def readHeaders(real_bytes, frameRate=DEFAULT_FRAME_RATE):
+    """
+    Read the headers of the blocks iterPacBlocks finds in the bytes (or mmap)
+    of a PAC/FPC file, return them as an array of HEADER_DTYPE records with
+    the times as frame counts at frameRate. Every block is included, also
+    those whose text is empty, repeated or runs into the end of the file.
+    """
+
+    data = np.frombuffer(real_bytes, dtype=np.uint8)
+    markers, timeStarts, textLengths = chainBlocks(data, *findMarkers(data))
+
+    startHigh, startLow, endHigh, endLow = [
+        headerWords(data, timeStarts, offset) for offset in (1, 3, 5, 7)]
+    if frameRate == FRAME_RATE_AUTO:
+        frameRate = detectFrameRate(zip((startHigh << 16 | startLow).tolist(),
+                                        (endHigh << 16 | endLow).tolist()))
+    else:
+        frameRate = getFrameRate(frameRate)
+
+    headers = np.empty(len(markers), dtype=HEADER_DTYPE)
+    headers['start'] = framesFromPac(startHigh, startLow, frameRate)
+    headers['end'] = framesFromPac(endHigh, endLow, frameRate)
+    headers['marker'] = markers
+    headers['textLength'] = textLengths
+    return headers
+
+
+def loadHeaders(subtitle_file, frameRate=DEFAULT_FRAME_RATE):
+    """readHeaders of a file, read through a memory map"""
+
+    with open(subtitle_file, 'rb') as inf:
+        try:
+            real_bytes = mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            return readHeaders(b'', frameRate)
+    try:
+        return readHeaders(real_bytes, frameRate)
+    finally:
+        real_bytes.close()
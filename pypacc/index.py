@@ -0,0 +1,717 @@
+# -*- coding: utf-8 -*-
+
+# Indexes of parsed files. A BlockIndex keeps each subtitle block with the byte
+# range it was scanned from, a hash of those bytes and its decoded paragraph;
+# when an edited file is parsed again against its index, only the blocks whose
+# bytes changed are decoded. A TimeIndex keeps only the time codes and text
+# positions of the blocks, read from their headers, to look up the cues shown
+# at a time and decode just those.
+
+
+from array import array
+import bisect
+import hashlib
+import itertools
+import mmap
+import os
+import struct
+import sys
+
+from .codecs import (OUTPUT_ERRORS, STORED_ENCODING, STORED_ERRORS,
+                     getTextDecoder, normalizeRulesDigest)
+from .parser import (DETECT_SAMPLE_SIZE, PARSER_VERSION, STREAM_BLOCK_MARGIN,
+                     decodePacText, findPacBlock, getPacBlock,
+                     getPacParagraph, iterPacBlocks, resolveFrameRate,
+                     uniqueParagraphs)
+from .stats import phaseTimer
+from .timecode import DEFAULT_FRAME_RATE, FRAME_RATE_AUTO, getFrameRate
+from .track import TIME_ARRAY_TYPE, Paragraph, TimeCode, parseTime
+
+
+# Suffix of the index files kept next to subtitle files
+INDEX_SUFFIX = '.pbi'
+
+# Bytes before a block's range that scanning reads (the header of a block is
+# up to 15 bytes before its 0xFE marker); the STREAM_BLOCK_MARGIN bytes after
+# it that decoding reads are hashed as well
+INDEX_LEAD = 16
+
+# Size of the block hashes, in bytes
+INDEX_HASH_SIZE = 16
+
+# Blocks in each page of an index: pages whose bytes have not changed, even if
+# they moved, are reused whole without looking at their blocks
+INDEX_PAGE_BLOCKS = 256
+
+# Changed blocks in a row that are taken to replace the blocks that were where
+# they are before blocks are looked up by their hash: the bytes hashed for a
+# block reach into the blocks around it, so those change with it
+INDEX_GUESS_BLOCKS = 4
+
+# Index files: magic, parser version, number of blocks, size of the texts, the
+# digest of the normalization rules the texts were made with and the lengths
+# of the code page and frame rate names, then the names and the columns of the
+# index (offsets, lengths, start and end frames and text ends as little-endian
+# 64-bit integers, then the block and page hashes, whether each block has a
+# paragraph, and the texts)
+INDEX_MAGIC = b'PBI4'
+INDEX_HEADER = struct.Struct('<4sIIQ20sBB')
+
+# Suffix of the time index files kept next to subtitle files
+TIME_INDEX_SUFFIX = '.pti'
+
+# Time index files: magic, parser version, number of blocks and the lengths
+# of the code page, frame rate and file stamp, then those and the columns of
+# the index as little-endian 64-bit integers
+TIME_INDEX_MAGIC = b'PTI1'
+TIME_INDEX_HEADER = struct.Struct('<4sIIBBB')
+
+
+class BlockIndex(object):
+    """
+    The subtitle blocks of a file in order, by column: where the scan for
+    each block started (the end of the previous block), the number of bytes
+    from there to the end of its text, the hash of those bytes and the
+    paragraph decoded from the block (its start and end frames and the end
+    of its text in texts), for a code page, frame rate and normalization
+    rules (their digest). Blocks whose text runs into the end of the file
+    have no paragraph. Texts are decoded when the paragraphs are asked for.
+    """
+
+    __slots__ = ('codePage', 'frameRate', 'rulesDigest', 'offsets',
+                 'lengths', 'hashes', 'pageHashes', 'starts', 'ends',
+                 'textEnds', 'hasParagraph', 'texts')
+
+    def __init__(self, codePage, frameRate=DEFAULT_FRAME_RATE,
+                 rulesDigest=None):
+        self.codePage = codePage
+        self.frameRate = getFrameRate(frameRate)
+        self.rulesDigest = rulesDigest or normalizeRulesDigest()
+        self.offsets = array('Q')
+        self.lengths = array('Q')
+        self.hashes = bytearray()
+        self.pageHashes = bytearray()
+        self.starts = array('q')
+        self.ends = array('q')
+        self.textEnds = array('q')
+        self.hasParagraph = bytearray()
+        self.texts = bytearray()
+
+    def append(self, offset, length, digest, paragraph):
+        self.offsets.append(offset)
+        self.lengths.append(length)
+        self.hashes += digest
+        if paragraph is None:
+            self.starts.append(0)
+            self.ends.append(0)
+            self.hasParagraph.append(0)
+        else:
+            self.starts.append(paragraph.startTime.frames)
+            self.ends.append(paragraph.endTime.frames)
+            self.hasParagraph.append(1)
+            self.texts += paragraph.text.encode(STORED_ENCODING,
+                                                STORED_ERRORS)
+        self.textEnds.append(len(self.texts))
+
+    def extend(self, other, first, last, shift=0):
+        """Append the blocks first to last of other, moved by shift bytes"""
+
+        offsets = other.offsets[first:last]
+        if shift:
+            offsets = array('Q', [offset + shift for offset in offsets])
+        self.offsets += offsets
+        self.lengths += other.lengths[first:last]
+        self.hashes += other.hashes[first * INDEX_HASH_SIZE:
+                                    last * INDEX_HASH_SIZE]
+        self.starts += other.starts[first:last]
+        self.ends += other.ends[first:last]
+        self.hasParagraph += other.hasParagraph[first:last]
+
+        textStart = other.textEnds[first - 1] if first else 0
+        textEnds = other.textEnds[first:last]
+        moved = len(self.texts) - textStart
+        if moved:
+            textEnds = array('q', [end + moved for end in textEnds])
+        self.texts += other.texts[textStart:other.textEnds[last - 1]]
+        self.textEnds += textEnds
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def blockHash(self, i):
+        return self.hashes[i * INDEX_HASH_SIZE:(i + 1) * INDEX_HASH_SIZE]
+
+    def pageHash(self, page):
+        return self.pageHashes[page * INDEX_HASH_SIZE:
+                               (page + 1) * INDEX_HASH_SIZE]
+
+    def pageEnd(self, first):
+        """Return the block after the page starting at block first"""
+
+        return min(first + INDEX_PAGE_BLOCKS, len(self))
+
+    def hashPages(self, view, reused=None):
+        """
+        Hash the bytes of each page of blocks in view, the file's bytes, but
+        those whose hashes are in reused, by page number
+        """
+
+        reused = reused or {}
+        pageHashes = bytearray()
+        for page, first in enumerate(range(0, len(self), INDEX_PAGE_BLOCKS)):
+            if page in reused:
+                pageHashes += reused[page]
+                continue
+            last = self.pageEnd(first) - 1
+            pageHashes += blockHash(view, self.offsets[first],
+                                    self.offsets[last] + self.lengths[last])
+        self.pageHashes = pageHashes
+
+    def blockKeys(self):
+        """Return the first block of each (hash, length)"""
+
+        hashes = bytes(self.hashes)
+        keys = zip([hashes[i:i + INDEX_HASH_SIZE]
+                    for i in range(0, len(hashes), INDEX_HASH_SIZE)],
+                   self.lengths)
+        # Filled from the end, so that the first of equal blocks is kept
+        return dict(zip(reversed(list(keys)), range(len(self) - 1, -1, -1)))
+
+    def getParagraphs(self):
+        """Return the paragraphs loadSubtitle would return"""
+
+        return uniqueParagraphs(self.iterParagraphs())
+
+    def iterParagraphs(self):
+        """Decode the paragraph of each block that has one"""
+
+        fromFrames = TimeCode.fromFrames
+        frameRate = self.frameRate
+        texts = bytes(self.texts)
+        textStart = 0
+        for start, end, textEnd, hasParagraph in zip(
+                self.starts, self.ends, self.textEnds, self.hasParagraph):
+            if hasParagraph:
+                yield Paragraph(fromFrames(start, frameRate),
+                                fromFrames(end, frameRate),
+                                texts[textStart:textEnd].decode(
+                                    STORED_ENCODING, STORED_ERRORS))
+            textStart = textEnd
+
+    def pack(self):
+        """Pack the index in the binary format of index files"""
+
+        codePage = self.codePage.encode('ascii')
+        frameRate = self.frameRate.name.encode('ascii')
+        parts = [INDEX_HEADER.pack(INDEX_MAGIC, PARSER_VERSION, len(self),
+                                   len(self.texts), self.rulesDigest,
+                                   len(codePage), len(frameRate)),
+                 codePage, frameRate]
+        for column in (self.offsets, self.lengths, self.starts, self.ends,
+                       self.textEnds):
+            if sys.byteorder != 'little':
+                column = array(column.typecode, column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        parts.extend([self.hashes, self.pageHashes, self.hasParagraph,
+                      self.texts])
+        return b''.join(parts)
+
+    @classmethod
+    def unpack(cls, data):
+        """
+        Unpack an index packed by pack(), raise ValueError if it is not an
+        index of this parser version
+        """
+
+        (magic, version, count, textSize, rulesDigest, codePageLength,
+         frameRateLength) = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC or version != PARSER_VERSION:
+            raise ValueError('Not a block index of this parser version')
+        index = INDEX_HEADER.size
+        codePage = data[index:index + codePageLength].decode('ascii')
+        index += codePageLength
+        frameRate = getFrameRate(
+            data[index:index + frameRateLength].decode('ascii'))
+        index += frameRateLength
+
+        blockIndex = cls(codePage, frameRate, rulesDigest)
+        pages = -(-count // INDEX_PAGE_BLOCKS)
+        if len(data) != (index + count * (5 * 8 + INDEX_HASH_SIZE + 1) +
+                         pages * INDEX_HASH_SIZE + textSize):
+            raise ValueError('Truncated block index')
+        for name in ('offsets', 'lengths', 'starts', 'ends', 'textEnds'):
+            column = getattr(blockIndex, name)
+            column.frombytes(data[index:index + count * 8])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            index += count * 8
+        for name, size in (('hashes', count * INDEX_HASH_SIZE),
+                           ('pageHashes', pages * INDEX_HASH_SIZE),
+                           ('hasParagraph', count),
+                           ('texts', textSize)):
+            setattr(blockIndex, name, bytearray(data[index:index + size]))
+            index += size
+        return blockIndex
+
+    def save(self, path):
+        """Write the index to path, replacing it atomically"""
+
+        tmp_file = '{0}.{1}.tmp'.format(path, os.getpid())
+        try:
+            with open(tmp_file, 'wb') as outf:
+                outf.write(self.pack())
+            os.rename(tmp_file, path)
+        except OSError:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Read the index saved in path, return None if it is unusable"""
+
+        try:
+            with open(path, 'rb') as inf:
+                data = inf.read()
+            return cls.unpack(data)
+        except (IOError, OSError, struct.error, ValueError):
+            return None
+
+
+def blockHash(view, offset, end):
+    """Hash the bytes a block's scan and decoding read"""
+
+    return hashlib.blake2b(view[max(offset - INDEX_LEAD, 0):
+                                end + STREAM_BLOCK_MARGIN],
+                           digest_size=INDEX_HASH_SIZE).digest()
+
+
+def nextPacBlock(start, real_bytes):
+    """
+    Return the next valid block when scanning resumes at start, as
+    iterPacBlocks finds it
+    """
+
+    index = start
+    while True:
+        feIndex = findPacBlock(index, real_bytes, start)
+        if feIndex is None:
+            return None
+        block = getPacBlock(feIndex, real_bytes, start)
+        if block is not None:
+            return block
+        index = feIndex
+
+
+def indexSubtitle(real_bytes, codePage=None, frameRate=DEFAULT_FRAME_RATE,
+                  oldIndex=None, sampleSize=DETECT_SAMPLE_SIZE):
+    """
+    Parse the bytes (or mmap) of a PAC/FPC file into a BlockIndex. Pages and
+    blocks whose bytes are unchanged since oldIndex, the index of an earlier
+    version of the file, keep their paragraphs, and only the others are
+    decoded with getPacParagraph; oldIndex itself is returned if nothing
+    changed. The code page defaults to the one of oldIndex, else it is
+    detected from the first sampleSize blocks.
+    """
+
+    frameRate = resolveFrameRate(frameRate, real_bytes)
+    if not codePage:
+        if oldIndex is not None:
+            codePage = oldIndex.codePage
+        else:
+            from .detect import scoreSample
+            sample = list(itertools.islice(iterPacBlocks(real_bytes),
+                                           sampleSize or None))
+            codePage = scoreSample(sample, real_bytes, frameRate)[1]
+    codePage = codePage.lower()
+
+    if oldIndex is not None and (
+            oldIndex.codePage != codePage or
+            oldIndex.frameRate is not frameRate or
+            oldIndex.rulesDigest != normalizeRulesDigest()):
+        oldIndex = None
+    old = oldIndex if oldIndex is not None else BlockIndex(codePage,
+                                                           frameRate)
+
+    # Pages, then blocks, are first looked for where they were, shifted by
+    # the bytes inserted or removed before them. Changed blocks are taken to
+    # replace the ones that were there, up to INDEX_GUESS_BLOCKS in a row,
+    # then blocks are looked up by their hash.
+    known = None
+    position = 0
+    shift = 0
+    guessed = 0
+    decoded = False
+    reused = {}  # Hashes of the pages copied whole to a page of their own
+
+    blockIndex = BlockIndex(codePage, frameRate)
+    view = memoryview(real_bytes)
+    offset = 0
+    with phaseTimer('index'):
+        while True:
+            expected = position < len(old) and \
+                old.offsets[position] + shift == offset
+            if expected:
+                if position % INDEX_PAGE_BLOCKS == 0:
+                    last = old.pageEnd(position)
+                    end = old.offsets[last - 1] + old.lengths[last - 1] + shift
+                    pageHash = old.pageHash(position // INDEX_PAGE_BLOCKS)
+                    if blockHash(view, offset, end) == pageHash:
+                        if len(blockIndex) % INDEX_PAGE_BLOCKS == 0 and \
+                                last - position == INDEX_PAGE_BLOCKS:
+                            reused[len(blockIndex) // INDEX_PAGE_BLOCKS] = \
+                                pageHash
+                        blockIndex.extend(old, position, last, shift)
+                        offset = end
+                        position = last
+                        guessed = 0
+                        continue
+                length = old.lengths[position]
+                digest = blockHash(view, offset, offset + length)
+                if digest == old.blockHash(position):
+                    blockIndex.extend(old, position, position + 1, shift)
+                    offset += length
+                    position += 1
+                    guessed = 0
+                    continue
+
+            block = nextPacBlock(offset, real_bytes)
+            if block is None:
+                break
+            feIndex = block[2]
+            length = max(block[3], feIndex) + 1 - offset
+            digest = blockHash(view, offset, offset + length)
+            match = None
+            if guessed >= INDEX_GUESS_BLOCKS or not expected:
+                if known is None:
+                    known = old.blockKeys()
+                match = known.get((digest, length))
+            if match is None:
+                blockIndex.append(offset, length, digest, getPacParagraph(
+                    feIndex - 1, real_bytes, codePage, frameRate,
+                    start=offset))
+                decoded = True
+                if expected:
+                    shift += length - old.lengths[position]
+                    position += 1
+                    guessed += 1
+            else:
+                position = match + 1
+                shift = offset - old.offsets[match]
+                blockIndex.extend(old, match, position, shift)
+                guessed = 0
+            offset += length
+
+        if oldIndex is not None and known is None and not decoded and \
+                blockIndex.offsets == old.offsets:
+            # Every page was found where it was
+            view.release()
+            return oldIndex
+        blockIndex.hashPages(view, reused)
+    view.release()
+
+    return blockIndex
+
+
+def loadIndexed(subtitle_file, codePage=None, frameRate=DEFAULT_FRAME_RATE,
+                indexFile=None):
+    """
+    Read a PAC/FPC file as loadSubtitle does, decoding only the blocks that
+    changed since the index saved in indexFile (subtitle_file + INDEX_SUFFIX
+    by default) was made, then save the file's new index there. Return the
+    paragraphs.
+    """
+
+    if indexFile is None:
+        indexFile = subtitle_file + INDEX_SUFFIX
+    if not codePage and subtitle_file[-3:].lower() == 'fpc':
+        codePage = 'utf-8'
+
+    with phaseTimer('read'):
+        with open(subtitle_file, 'rb') as inf:
+            real_bytes = inf.read()
+
+    oldIndex = BlockIndex.load(indexFile)
+    blockIndex = indexSubtitle(real_bytes, codePage, frameRate, oldIndex)
+    if blockIndex is not oldIndex:
+        try:
+            blockIndex.save(indexFile)
+        except OSError:
+            pass  # Read-only directory or full disk: made again next time
+    return blockIndex.getParagraphs()
+
+
+class TimeIndex(object):
+    """
+    The time codes of a file's blocks (as frame counts) and where their text
+    is, read from the block headers without decoding any text, with the
+    blocks ordered by start time for binary search. stamp is the modification
+    time and size of the file the index was made from.
+    """
+
+    __slots__ = ('codePage', 'frameRate', 'stamp', 'starts', 'ends',
+                 'markers', 'textEnds', 'order', 'orderStarts', 'reach')
+
+    def __init__(self, codePage, frameRate=DEFAULT_FRAME_RATE, stamp=''):
+        self.codePage = codePage
+        self.frameRate = getFrameRate(frameRate)
+        self.stamp = stamp
+        self.starts = array(TIME_ARRAY_TYPE)
+        self.ends = array(TIME_ARRAY_TYPE)
+        self.markers = array(TIME_ARRAY_TYPE)
+        self.textEnds = array(TIME_ARRAY_TYPE)
+        self.order = array(TIME_ARRAY_TYPE)
+
+    @classmethod
+    def fromBytes(cls, real_bytes, codePage, frameRate=DEFAULT_FRAME_RATE,
+                  stamp=''):
+        """Index the block headers of the bytes (or mmap) of a file"""
+
+        frameRate = resolveFrameRate(frameRate, real_bytes)
+        timeIndex = cls(codePage, frameRate, stamp)
+        framesFromPac = frameRate.framesFromPac
+        with phaseTimer('scan'):
+            for block in iterPacBlocks(real_bytes):
+                timeIndex.starts.append(framesFromPac(block[0]))
+                timeIndex.ends.append(framesFromPac(block[1]))
+                timeIndex.markers.append(block[2])
+                timeIndex.textEnds.append(block[3])
+        timeIndex.order = array(TIME_ARRAY_TYPE,
+                                sorted(range(len(timeIndex.starts)),
+                                       key=timeIndex.starts.__getitem__))
+        timeIndex.sortTimes()
+        return timeIndex
+
+    def sortTimes(self):
+        # Start times in start order, and the latest end time up to each of
+        # them, which never decreases, so both can be bisected
+        self.orderStarts = array(TIME_ARRAY_TYPE,
+                                 map(self.starts.__getitem__, self.order))
+        self.reach = array(TIME_ARRAY_TYPE, itertools.accumulate(
+            map(self.ends.__getitem__, self.order), max))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def find(self, start, end=None):
+        """
+        Return the numbers of the blocks shown between start and end (in
+        milliseconds, end excluded), or at start if end is None, in file
+        order
+        """
+
+        if end is None:
+            end = start + 1
+        # A block is shown if it starts before end and ends after start
+        startFrame = self.frameRate.framesFromMilliseconds(start + 1)
+        endFrame = self.frameRate.framesFromMilliseconds(end)
+        first = bisect.bisect_left(self.reach, startFrame)
+        last = bisect.bisect_left(self.orderStarts, endFrame)
+        ends = self.ends
+        return sorted(i for i in self.order[first:last]
+                      if ends[i] >= startFrame)
+
+    def pack(self):
+        """Pack the index in the binary format of time index files"""
+
+        names = [name.encode('utf-8', OUTPUT_ERRORS) for name in
+                 (self.codePage, self.frameRate.name, self.stamp)]
+        parts = [TIME_INDEX_HEADER.pack(TIME_INDEX_MAGIC, PARSER_VERSION,
+                                        len(self), *map(len, names))]
+        parts.extend(names)
+        for column in (self.starts, self.ends, self.markers, self.textEnds,
+                       self.order):
+            if sys.byteorder != 'little':
+                column = array(TIME_ARRAY_TYPE, column)
+                column.byteswap()
+            parts.append(column.tobytes())
+        return b''.join(parts)
+
+    @classmethod
+    def unpack(cls, data):
+        """
+        Unpack an index packed by pack(), raise ValueError if it is not a
+        time index of this parser version
+        """
+
+        header = TIME_INDEX_HEADER.unpack_from(data)
+        magic, version, count = header[:3]
+        if magic != TIME_INDEX_MAGIC or version != PARSER_VERSION:
+            raise ValueError('Not a time index of this parser version')
+        index = TIME_INDEX_HEADER.size
+        names = []
+        for length in header[3:]:
+            names.append(data[index:index + length].decode('utf-8',
+                                                           OUTPUT_ERRORS))
+            index += length
+
+        timeIndex = cls(*names)
+        columnSize = count * timeIndex.starts.itemsize
+        if len(data) != index + 5 * columnSize:
+            raise ValueError('Truncated time index')
+        for name in ('starts', 'ends', 'markers', 'textEnds', 'order'):
+            column = array(TIME_ARRAY_TYPE)
+            column.frombytes(data[index:index + columnSize])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            setattr(timeIndex, name, column)
+            index += columnSize
+        timeIndex.sortTimes()
+        return timeIndex
+
+    def save(self, path):
+        """Write the index to path, replacing it atomically"""
+
+        tmp_file = '{0}.{1}.tmp'.format(path, os.getpid())
+        try:
+            with open(tmp_file, 'wb') as outf:
+                outf.write(self.pack())
+            os.rename(tmp_file, path)
+        except OSError:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """Read the index saved in path, return None if it is unusable"""
+
+        try:
+            with open(path, 'rb') as inf:
+                data = inf.read()
+            return cls.unpack(data)
+        except (IOError, OSError, struct.error, ValueError):
+            return None
+
+
+class SeekableSubtitle(object):
+    """
+    A PAC/FPC file opened for lookups by time: its TimeIndex and a memory
+    map of the file, from which only the texts of the cues looked up are
+    decoded
+    """
+
+    def __init__(self, real_bytes, timeIndex):
+        self.real_bytes = real_bytes
+        self.timeIndex = timeIndex
+        self.decodeText = getTextDecoder(timeIndex.codePage)
+        self.texts = {}  # Decoded texts by block number
+
+    def __len__(self):
+        return len(self.timeIndex)
+
+    def text(self, i):
+        """Return the text of block i, or None if it runs into the end"""
+
+        if i not in self.texts:
+            timeIndex = self.timeIndex
+            block = (None, None, timeIndex.markers[i], timeIndex.textEnds[i])
+            with phaseTimer('decode'):
+                self.texts[i] = decodePacText(block, self.real_bytes,
+                                              self.decodeText)
+        return self.texts[i]
+
+    def isShown(self, i):
+        """
+        Return True if loadSubtitle keeps block i: its text is not empty nor
+        the same as the last text before it
+        """
+
+        text = self.text(i)
+        if not text:
+            return False
+        for j in range(i - 1, -1, -1):
+            previous = self.text(j)
+            if previous:
+                return previous != text
+        return True
+
+    def cues(self, start, end=None):
+        """
+        Return the paragraphs shown between start and end (in milliseconds,
+        or times such as '01:23:45'; end excluded), or at start if end is
+        None, decoding only their texts
+        """
+
+        if isinstance(start, str):
+            start = parseTime(start)
+        if isinstance(end, str):
+            end = parseTime(end)
+
+        timeIndex = self.timeIndex
+        frameRate = timeIndex.frameRate
+        fromFrames = TimeCode.fromFrames
+        return [Paragraph(fromFrames(timeIndex.starts[i], frameRate),
+                          fromFrames(timeIndex.ends[i], frameRate),
+                          self.text(i))
+                for i in timeIndex.find(start, end) if self.isShown(i)]
+
+    def close(self):
+        if isinstance(self.real_bytes, mmap.mmap):
+            self.real_bytes.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def fileStamp(subtitle_file):
+    st = os.stat(subtitle_file)
+    return '{0!r} {1}'.format(st.st_mtime, st.st_size)
+
+
+def openSeekable(subtitle_file, codePage=None, frameRate=DEFAULT_FRAME_RATE,
+                 indexFile=None, sampleSize=DETECT_SAMPLE_SIZE):
+    """
+    Open a PAC/FPC file for lookups by time. Its TimeIndex is read from
+    indexFile (subtitle_file + TIME_INDEX_SUFFIX by default), or made from
+    the block headers and saved there if the file, code page or frame rate
+    changed. The code page is detected from the first sampleSize blocks if
+    not given. Return a SeekableSubtitle.
+    """
+
+    if indexFile is None:
+        indexFile = subtitle_file + TIME_INDEX_SUFFIX
+    if codePage:
+        codePage = codePage.lower()
+    elif subtitle_file[-3:].lower() == 'fpc':
+        codePage = 'utf-8'
+
+    with open(subtitle_file, 'rb') as inf:
+        try:
+            real_bytes = mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            real_bytes = b''
+
+    try:
+        stamp = fileStamp(subtitle_file)
+        timeIndex = TimeIndex.load(indexFile)
+        if timeIndex is not None and (
+                timeIndex.stamp != stamp or
+                codePage and timeIndex.codePage != codePage or
+                frameRate != FRAME_RATE_AUTO and
+                timeIndex.frameRate is not getFrameRate(frameRate)):
+            timeIndex = None
+
+        if timeIndex is None:
+            frameRate = resolveFrameRate(frameRate, real_bytes)
+            if not codePage:
+                from .detect import scoreSample
+                sample = list(itertools.islice(iterPacBlocks(real_bytes),
+                                               sampleSize or None))
+                codePage = scoreSample(sample, real_bytes, frameRate)[1]
+            timeIndex = TimeIndex.fromBytes(real_bytes, codePage, frameRate,
+                                            stamp)
+            try:
+                timeIndex.save(indexFile)
+            except OSError:
+                pass  # Read-only directory or full disk: made again next time
+
+        return SeekableSubtitle(real_bytes, timeIndex)
+    except Exception:
+        if isinstance(real_bytes, mmap.mmap):
+            real_bytes.close()
+        raise
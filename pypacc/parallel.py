@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+# Decoding of one large file on several cores: the blocks are found with a
+# single scan, split into shards of consecutive blocks, and the shards' text is
+# decoded by a pool of worker processes, each reading the file through its own
+# memory map. The paragraphs are merged back in file order.
+
+
+import mmap
+import multiprocessing
+
+from .parser import (decodePacBlocks, findPacBlock, getPacBlock,
+                     iterPacBlocks, resolveFrameRate, uniqueParagraphs)
+from .stats import phaseTimer
+from .timecode import DEFAULT_FRAME_RATE
+from .track import Paragraph, RichParagraph, TimeCode
+
+
+# Files smaller than this are decoded in the calling process, as starting the
+# worker processes takes longer than decoding them
+PARALLEL_MIN_SIZE = 2 ** 21
+
+# Shards per worker process, so that workers that finish early take more
+PARALLEL_SHARDS_PER_JOB = 4
+
+# Memory map of the file and the decoding settings of a worker process
+SHARD_FILE = None
+
+
+def openShardFile(subtitle_file, codePage, frameRate, rich):
+    """Pool initializer: map the file being decoded into the worker"""
+
+    global SHARD_FILE
+    with open(subtitle_file, 'rb') as inf:
+        real_bytes = mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ)
+    SHARD_FILE = (real_bytes, codePage, frameRate, rich)
+
+
+def iterShardBlocks(real_bytes, offset, count):
+    """
+    Yield the count blocks iterPacBlocks finds when it resumes scanning at
+    offset (where the block before the shard ends)
+    """
+
+    for i in range(count):
+        index = offset
+        while True:
+            feIndex = findPacBlock(index, real_bytes, offset)
+            block = getPacBlock(feIndex, real_bytes, offset)
+            index = feIndex
+            if block is not None:
+                break
+        yield block
+        offset = max(block[3], feIndex) + 1
+
+
+def decodeShard(shard):
+    """
+    Decode the blocks of a shard, given as (offset, count), in a worker.
+    Return the shard's unique paragraphs by column: start and end frame
+    counts, texts and layouts (None if not rich).
+    """
+
+    real_bytes, codePage, frameRate, rich = SHARD_FILE
+    paragraphs = uniqueParagraphs(decodePacBlocks(
+        iterShardBlocks(real_bytes, *shard), real_bytes, codePage, frameRate,
+        rich))
+    return ([p.startTime.frames for p in paragraphs],
+            [p.endTime.frames for p in paragraphs],
+            [p.text for p in paragraphs],
+            [p.layout for p in paragraphs] if rich else None)
+
+
+def mergeShards(results, frameRate):
+    """Yield the paragraphs of the decoded shards, in order"""
+
+    fromFrames = TimeCode.fromFrames
+    for starts, ends, texts, layouts in results:
+        if layouts is None:
+            for start, end, text in zip(starts, ends, texts):
+                yield Paragraph(fromFrames(start, frameRate),
+                                fromFrames(end, frameRate), text)
+        else:
+            for start, end, text, layout in zip(starts, ends, texts,
+                                                layouts):
+                yield RichParagraph(fromFrames(start, frameRate),
+                                    fromFrames(end, frameRate), text, layout)
+
+
+def loadParallel(subtitle_file, codePage, frameRate=DEFAULT_FRAME_RATE,
+                 rich=False, jobs=None):
+    """
+    loadSubtitle with the text decoded by a pool of jobs processes (one per
+    core by default). Empty and repeated paragraphs are dropped within each
+    shard, and again across shard edges as the shards are merged, which
+    gives the paragraphs loadSubtitle returns.
+    """
+
+    with open(subtitle_file, 'rb') as inf:
+        try:
+            real_bytes = mmap.mmap(inf.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty file
+            return []
+    try:
+        frameRate = resolveFrameRate(frameRate, real_bytes)
+        with phaseTimer('scan'):
+            blocks = list(iterPacBlocks(real_bytes))
+
+        jobs = jobs or multiprocessing.cpu_count()
+        if jobs == 1 or len(blocks) < 2:
+            return uniqueParagraphs(decodePacBlocks(blocks, real_bytes,
+                                                    codePage, frameRate,
+                                                    rich))
+    finally:
+        real_bytes.close()
+
+    # Shards are sent to the workers as the offset where the scan resumes
+    # before their first block and their number of blocks
+    size = -(-len(blocks) // (jobs * PARALLEL_SHARDS_PER_JOB))
+    shards = []
+    offset = 0
+    for i in range(0, len(blocks), size):
+        shard = blocks[i:i + size]
+        shards.append((offset, len(shard)))
+        offset = max(shard[-1][3], shard[-1][2]) + 1
+
+    pool = multiprocessing.Pool(min(jobs, len(shards)),
+                                initializer=openShardFile,
+                                initargs=(subtitle_file, codePage, frameRate,
+                                          rich))
+    try:
+        with phaseTimer('decode'):
+            return uniqueParagraphs(mergeShards(
+                pool.imap(decodeShard, shards), frameRate))
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,590 @@
+# -*- coding: utf-8 -*-
+
+# The PAC/FPC parser: finds the subtitle blocks of a file in a single scan,
+# reads their time codes and decodes their text.
+
+
+import os
+import re
+import struct
+import sys
+
+from . import stats
+from .codecs import (OUTPUT_ERRORS, decodeBig5, getTextDecoder, normalizeText,
+                     normalizeTexts)
+from .stats import phaseTimer
+from .timecode import (DEFAULT_FRAME_RATE, FRAME_RATE_AUTO, MILLISECONDS,
+                       detectFrameRate, getFrameRate)
+from .track import Layout, Paragraph, RichParagraph, SubtitleTrack, TimeCode
+
+
+# Number of subtitle blocks sampled by autoDetect (0 samples every block)
+DETECT_SAMPLE_SIZE = 200
+
+# Bytes read at a time by iterParagraphs
+STREAM_CHUNK_SIZE = 65536
+
+# Bytes iterParagraphs needs past the end of a block's text before decoding
+# it: the 20 bytes decodePacText checks for and room for the W16 codes
+STREAM_BLOCK_MARGIN = 32
+
+# Bump when a change alters the parser's output, so that ParseCache entries
+# made by older versions are not used
+PARSER_VERSION = 2
+
+# Subtitle block header after the 0x60 byte: start and end time codes (two
+# words each) and text length
+PAC_BLOCK_HEADER = struct.Struct('<HHHHH')
+
+
+def parse(source, codePage=None, sampleSize=DETECT_SAMPLE_SIZE, cache=None,
+          frameRate=DEFAULT_FRAME_RATE, rich=False):
+    """
+    Parse a PAC/FPC file, given as bytes (or a bytearray or mmap) or as a
+    path, with the given encoding, utf-8 for FPC files, or an automatically
+    detected encoding. frameRate is a FrameRate, a name such as '29.97DF',
+    or 'auto'. Paths are looked up in, and added to, the ParseCache cache if
+    given. With rich, the Layout of each block is kept. Return a
+    SubtitleTrack.
+    Raises PacError if the file cannot be decoded.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        return SubtitleTrack(readSubtitle(os.fspath(source), codePage,
+                                          sampleSize, cache, frameRate, rich),
+                             rich)
+
+    if codePage:
+        paragraphs = uniqueParagraphs(iterPacParagraphs(source,
+                                                        codePage.lower(),
+                                                        frameRate, rich))
+    else:
+        from .detect import detectEncoding
+        paragraphs = detectEncoding(source, sampleSize, frameRate, rich)[0]
+    return SubtitleTrack(paragraphs, rich)
+
+
+def readSubtitle(subtitle_file, codePage=None, sampleSize=DETECT_SAMPLE_SIZE,
+                 cache=None, frameRate=DEFAULT_FRAME_RATE, rich=False,
+                 jobs=1):
+    """
+    Read a PAC/FPC file (or stdin if subtitle_file is '-') with the given
+    encoding, utf-8 for FPC files, or an automatically detected encoding,
+    and frame rate. Files are looked up in, and added to, the ParseCache
+    cache if given (the cache does not keep layouts, so rich reads do not
+    use it). Large files are decoded by jobs processes (see loadSubtitle).
+    Return an iterable of paragraphs, RichParagraphs with rich.
+    """
+
+    if frameRate != FRAME_RATE_AUTO:
+        frameRate = getFrameRate(frameRate)
+
+    # Detection is only imported when a file is auto-detected
+    if subtitle_file == '-':
+        if codePage and frameRate != FRAME_RATE_AUTO:
+            # Paragraphs are parsed as they are written out
+            return iterParagraphs(sys.stdin.buffer, codePage.lower(),
+                                  frameRate=frameRate, rich=rich)
+        real_bytes = sys.stdin.buffer.read()
+        if codePage:
+            return uniqueParagraphs(iterPacParagraphs(real_bytes,
+                                                      codePage.lower(),
+                                                      frameRate, rich))
+        from .detect import detectEncoding
+        return detectEncoding(real_bytes, sampleSize, frameRate, rich)[0]
+
+    if codePage:
+        codePage = codePage.lower()
+    elif subtitle_file[-3:].lower() == 'fpc':
+        # Assume fpc file uses utf-8 encoding
+        codePage = 'utf-8'
+
+    if rich:
+        cache = None
+
+    cacheKey = codePage or 'auto {0}'.format(sampleSize)
+    if frameRate is not DEFAULT_FRAME_RATE:
+        cacheKey += ' fps {0}'.format(getattr(frameRate, 'name', frameRate))
+    if cache is not None:
+        cached = cache.load(subtitle_file, cacheKey)
+        if cached is not None:
+            return cached[0]
+
+    if codePage:
+        paragraphs = loadSubtitle(subtitle_file, codePage, frameRate, rich,
+                                  jobs)
+        encoding, confidence = codePage, None
+    else:
+        # Auto-detecting
+        from .detect import autoDetect
+        paragraphs, encoding, confidence = autoDetect(subtitle_file,
+                                                      sampleSize, frameRate,
+                                                      rich, jobs)
+
+    if cache is not None:
+        cache.save(subtitle_file, cacheKey, paragraphs, encoding, confidence)
+    return paragraphs
+
+
+def loadSubtitle(subtitle_file, codePage, frameRate=DEFAULT_FRAME_RATE,
+                 rich=False, jobs=1):
+    """
+    Reads in PAC file as binary data,
+    extracts text and timing information
+    (with a pool of jobs processes for large files, None for one per core)
+    """
+
+    if jobs != 1:
+        from .parallel import PARALLEL_MIN_SIZE, loadParallel
+        if os.path.getsize(subtitle_file) >= PARALLEL_MIN_SIZE:
+            return loadParallel(subtitle_file, codePage, frameRate, rich,
+                                jobs)
+
+    with phaseTimer('read'):
+        with open(subtitle_file, 'rb') as inf:
+            real_bytes = inf.read()
+
+    return uniqueParagraphs(iterPacParagraphs(real_bytes, codePage,
+                                              frameRate, rich))
+
+
+def uniqueParagraphs(paragraphs):
+    """Drop empty paragraphs and consecutive repeats"""
+
+    return list(iterUniqueParagraphs(paragraphs))
+
+
+def iterUniqueParagraphs(paragraphs):
+    """Drop empty paragraphs and consecutive repeats, as a generator"""
+
+    last = None
+    for paragraph in paragraphs:
+        if len(paragraph.text) > 0:
+            if last is None:
+                yield paragraph
+            elif paragraph == last:
+                if stats.STATS is not None:
+                    stats.STATS.duplicates += 1
+                continue
+            else:
+                yield paragraph
+            last = paragraph
+        elif stats.STATS is not None:
+            stats.STATS.emptyParagraphs += 1
+
+
+def getTimeCode(timeCodeIndex, byte_list, frameRate=DEFAULT_FRAME_RATE):
+    """Extract time code"""
+
+    if timeCodeIndex > 0:
+        # hours * 100 + minutes, seconds * 100 + frames
+        highPart, lowPart = struct.unpack_from('<HH', byte_list, timeCodeIndex)
+        frames = frameRate.framesFromPac(highPart << 16 | lowPart)
+
+        return TimeCode.fromFrames(frames, frameRate)
+
+    else:
+        return TimeCode()
+
+
+def resolveFrameRate(frameRate, real_bytes):
+    """Return the FrameRate of a name, detecting it from the file if 'auto'"""
+
+    if frameRate == FRAME_RATE_AUTO:
+        return detectFrameRate(iterPacBlocks(real_bytes))
+    return getFrameRate(frameRate)
+
+
+def paragraphsFrameRate(paragraphs, frameRate=DEFAULT_FRAME_RATE):
+    """
+    Return the frame rate of the time codes a list of paragraphs was read
+    from (the one detected with 'auto'), or frameRate if their times are not
+    frame counts
+    """
+
+    if paragraphs and paragraphs[0].startTime.frameRate is not MILLISECONDS:
+        return paragraphs[0].startTime.frameRate
+    return frameRate
+
+
+TEXT_CONTROL_RE = re.compile(b'[\xfe\xff]')
+
+
+def findPacBlock(index, real_bytes, start=0):
+    """
+    Return the index of the next 0xFE block marker after index (preceded by a
+    0x60/0x61 header 15 or 12 bytes earlier, at start or after), or None if
+    there is none. real_bytes can be a byte string or an mmap of the file.
+    """
+
+    index = max(index, start + 11, 15) + 1
+    end = len(real_bytes) - 20
+    while index < end:
+        index = real_bytes.find(b'\xfe', index, end)
+        if index < 0:
+            return None
+        if real_bytes[index - 15] in (0x60, 0x61) and index - 15 >= start or \
+           real_bytes[index - 12] in (0x60, 0x61):
+            return index
+        index += 1
+
+    return None
+
+
+def getPacBlock(feIndex, real_bytes, start=0):
+    """
+    Read the header of the subtitle block whose 0xFE marker is at feIndex,
+    return (startCode, endCode, feIndex, maxIndex) or None if there is no
+    valid header at start or after. The time codes are left packed, as
+    (hours * 100 + minutes) << 16 | (seconds * 100 + frames).
+    """
+
+    timeStartIndex = feIndex - 15
+
+    if real_bytes[timeStartIndex] == 0x60 and timeStartIndex >= start:
+        pass
+    elif real_bytes[timeStartIndex + 3] == 0x60 and \
+            timeStartIndex + 3 >= start:
+        timeStartIndex += 3
+    else:
+        return None
+
+    startHigh, startLow, endHigh, endLow, textLength = \
+        PAC_BLOCK_HEADER.unpack_from(real_bytes, timeStartIndex + 1)
+    maxIndex = timeStartIndex + 10 + textLength
+
+    return (startHigh << 16 | startLow, endHigh << 16 | endLow, feIndex,
+            maxIndex)
+
+
+def iterPacBlocks(real_bytes):
+    """
+    Scan the file once, yielding the header of each subtitle block.
+    Scanning resumes at the end of every block, and the header of the next
+    block cannot start before it (0xFE bytes in a block's number or time
+    codes are not markers).
+    """
+
+    collected = stats.STATS
+    if collected is not None:
+        collected.bytesScanned += len(real_bytes)
+
+    index = 0
+    start = 0
+    while True:
+        feIndex = findPacBlock(index, real_bytes, start)
+        if feIndex is None:
+            if collected is not None:
+                collected.bytesSkipped += max(len(real_bytes) - start, 0)
+            return
+        block = getPacBlock(feIndex, real_bytes, start)
+        if block is None:
+            if collected is not None:
+                collected.markersRejected += 1
+            index = feIndex
+        else:
+            if collected is not None:
+                collected.blocks += 1
+                header = feIndex - (15 if real_bytes[feIndex - 15] == 0x60 and
+                                    feIndex - 15 >= start else 12)
+                collected.bytesSkipped += header - start
+            yield block
+            # A text length too short to reach the marker must not rescan it
+            index = start = max(block[3], feIndex) + 1
+
+
+def decodePacText(block, real_bytes, decodeText):
+    """
+    Decode and normalize the text of a subtitle block, return None if the
+    text runs into the end of the file
+    """
+
+    text = decodePacRawText(block, real_bytes, decodeText)
+    if text is None:
+        return None
+
+    return normalizeText(text)
+
+
+def decodePacRawText(block, real_bytes, decodeText):
+    """
+    Decode the text of a subtitle block, using decodeText for runs of
+    text between control codes, return None if the text runs into the end
+    of the file
+    """
+
+    # The alignment and vertical position are read by decodePacLines
+    feIndex, maxIndex = block[2:4]
+    endIndex = min(maxIndex + 1, len(real_bytes))
+
+    string_buffer = ''
+    index = feIndex + 3
+    preTextCode = real_bytes[index + 1: index + 4]
+
+    if preTextCode == b'W16':
+        index += 5
+    while index < endIndex:
+        if preTextCode == b'W16':
+            if real_bytes[index] == 0xfe:
+                string_buffer += ' '
+                preTextCode = real_bytes[index + 4: index + 7]
+                if preTextCode == b'W16':
+                    index += 7
+                index += 2
+            else:
+                if real_bytes[index] == 0:
+                    text = real_bytes[index + 1: index + 2]
+                    string_buffer += text.decode('ascii', OUTPUT_ERRORS)
+                else:
+                    # Should be Chinese
+                    byte_list = real_bytes[index: index + 2]
+                    zh_char = decodeBig5(byte_list)
+                    string_buffer += zh_char
+
+                index += 1
+
+            index += 1
+        else:
+            # 0xff and 0xfe (followed by 2 bytes) are line breaks
+            match = TEXT_CONTROL_RE.search(real_bytes, index, endIndex)
+            if match is None:
+                string_buffer += decodeText(real_bytes[index:endIndex])
+                index = endIndex
+            else:
+                control = match.start()
+                string_buffer += decodeText(real_bytes[index:control]) + ' '
+                index = control + 1
+                if real_bytes[control] == 0xfe:
+                    index += 2
+
+    if index + 20 >= len(real_bytes):
+        return None
+
+    return string_buffer
+
+
+def decodePacLines(block, real_bytes, decodeText):
+    """
+    Decode the text of a subtitle block a line at a time, as
+    decodePacRawText does, and read its Layout: the vertical position byte,
+    and the alignment and format code bytes after the 0xFE marker that
+    starts each line. Return (lines, layout), or None if the text runs into
+    the end of the file. ' '.join(lines) is the text of decodePacRawText.
+    """
+
+    feIndex, maxIndex = block[2:4]
+    endIndex = min(maxIndex + 1, len(real_bytes))
+    timeStartIndex = feIndex - (15 if real_bytes[feIndex - 15] == 0x60
+                                else 12)
+
+    alignments = bytearray(real_bytes[feIndex + 1: feIndex + 2])
+    formats = bytearray(real_bytes[feIndex + 2: feIndex + 3])
+    lines = []
+    line = ''
+    index = feIndex + 3
+    preTextCode = real_bytes[index + 1: index + 4]
+
+    if preTextCode == b'W16':
+        index += 5
+    while index < endIndex:
+        if preTextCode == b'W16':
+            if real_bytes[index] == 0xfe:
+                lines.append(line)
+                line = ''
+                alignments += real_bytes[index + 1: index + 2]
+                formats += real_bytes[index + 2: index + 3]
+                preTextCode = real_bytes[index + 4: index + 7]
+                if preTextCode == b'W16':
+                    index += 7
+                index += 2
+            else:
+                if real_bytes[index] == 0:
+                    text = real_bytes[index + 1: index + 2]
+                    line += text.decode('ascii', OUTPUT_ERRORS)
+                else:
+                    line += decodeBig5(real_bytes[index: index + 2])
+                index += 1
+            index += 1
+        else:
+            match = TEXT_CONTROL_RE.search(real_bytes, index, endIndex)
+            if match is None:
+                line += decodeText(real_bytes[index:endIndex])
+                index = endIndex
+            else:
+                control = match.start()
+                lines.append(line + decodeText(real_bytes[index:control]))
+                line = ''
+                index = control + 1
+                if real_bytes[control] == 0xfe:
+                    alignments += real_bytes[index: index + 1]
+                    formats += real_bytes[index + 1: index + 2]
+                    index += 2
+                else:
+                    # 0xff breaks the line without codes of its own
+                    alignments.append(alignments[-1])
+                    formats.append(formats[-1])
+    lines.append(line)
+
+    if index + 20 >= len(real_bytes):
+        return None
+
+    return lines, Layout(real_bytes[timeStartIndex + 11], alignments, formats)
+
+
+def decodePacBlocks(blocks, real_bytes, codePage,
+                    frameRate=DEFAULT_FRAME_RATE, rich=False):
+    """
+    Decode the text of each block, yielding a paragraph per block with its
+    times as frame counts at frameRate. With rich, the paragraphs are
+    RichParagraphs with the Layout of their block.
+    """
+
+    if rich:
+        return decodePacBlocksRich(blocks, real_bytes, codePage, frameRate)
+    if stats.STATS is not None:
+        return decodePacBlocksTimed(blocks, real_bytes, codePage, frameRate,
+                                    stats.STATS)
+    return decodePacBlocksFast(blocks, real_bytes, codePage, frameRate)
+
+
+def decodePacBlocksFast(blocks, real_bytes, codePage, frameRate):
+    decodeText = getTextDecoder(codePage)
+    framesFromPac = frameRate.framesFromPac
+    fromFrames = TimeCode.fromFrames
+    for block in blocks:
+        text = decodePacText(block, real_bytes, decodeText)
+        if text is not None:
+            yield Paragraph(fromFrames(framesFromPac(block[0]), frameRate),
+                            fromFrames(framesFromPac(block[1]), frameRate),
+                            text)
+
+
+def decodePacBlocksRich(blocks, real_bytes, codePage, frameRate):
+    decodeText = getTextDecoder(codePage)
+    framesFromPac = frameRate.framesFromPac
+    fromFrames = TimeCode.fromFrames
+    for block in blocks:
+        decoded = decodePacLines(block, real_bytes, decodeText)
+        if decoded is None:
+            if stats.STATS is not None:
+                stats.STATS.truncatedBlocks += 1
+            continue
+        lines, layout = decoded
+        lines = normalizeTexts(lines)
+        layout.lineLengths = tuple(map(len, lines))
+        yield RichParagraph(fromFrames(framesFromPac(block[0]), frameRate),
+                            fromFrames(framesFromPac(block[1]), frameRate),
+                            ' '.join(lines), layout)
+
+
+def decodePacBlocksTimed(blocks, real_bytes, codePage, frameRate, collected):
+    """decodePacBlocks, timing the scan, decode and normalize phases"""
+
+    decodeText = getTextDecoder(codePage)
+    framesFromPac = frameRate.framesFromPac
+    fromFrames = TimeCode.fromFrames
+    blocks = iter(blocks)
+    scanTimer = collected.timer('scan')
+    decodeTimer = collected.timer('decode')
+    normalizeTimer = collected.timer('normalize')
+    while True:
+        with scanTimer:
+            block = next(blocks, None)
+        if block is None:
+            return
+        with decodeTimer:
+            text = decodePacRawText(block, real_bytes, decodeText)
+        if text is None:
+            collected.truncatedBlocks += 1
+            continue
+        with normalizeTimer:
+            text = normalizeText(text)
+        yield Paragraph(fromFrames(framesFromPac(block[0]), frameRate),
+                        fromFrames(framesFromPac(block[1]), frameRate), text)
+
+
+def getPacParagraph(index, real_bytes, codePage,
+                    frameRate=DEFAULT_FRAME_RATE, rich=False, start=0):
+    """
+    Main PAC decoding function (the block's header starts at start or
+    after)
+    """
+
+    feIndex = findPacBlock(index, real_bytes, start)
+    if feIndex is None:
+        return None
+
+    block = getPacBlock(feIndex, real_bytes, start)
+    if block is None:
+        return None
+
+    for p in decodePacBlocks([block], real_bytes, codePage,
+                             resolveFrameRate(frameRate, real_bytes), rich):
+        return p
+
+
+def iterPacParagraphs(real_bytes, codePage, frameRate=DEFAULT_FRAME_RATE,
+                      rich=False):
+    """Scan the file once, yielding each decoded paragraph"""
+
+    frameRate = resolveFrameRate(frameRate, real_bytes)
+    return decodePacBlocks(iterPacBlocks(real_bytes), real_bytes, codePage,
+                           frameRate, rich)
+
+
+def iterParagraphs(fileobj, codePage, chunkSize=STREAM_CHUNK_SIZE,
+                   frameRate=DEFAULT_FRAME_RATE, rich=False):
+    """
+    Read a PAC/FPC file object (e.g. a pipe or socket) in chunks, yielding
+    the paragraphs loadSubtitle would return as soon as they are decoded.
+    Only the unparsed tail of the stream is kept in memory, so the frame
+    rate cannot be detected.
+    """
+
+    if frameRate == FRAME_RATE_AUTO:
+        raise ValueError('The frame rate of a stream cannot be detected')
+    return iterUniqueParagraphs(iterStreamParagraphs(fileobj, codePage,
+                                                     chunkSize,
+                                                     getFrameRate(frameRate),
+                                                     rich))
+
+
+def iterStreamParagraphs(fileobj, codePage, chunkSize=STREAM_CHUNK_SIZE,
+                         frameRate=DEFAULT_FRAME_RATE, rich=False):
+    """
+    Read a PAC/FPC file object in chunks, yielding each decoded paragraph.
+    Blocks that cross a chunk boundary are decoded after the next read.
+    """
+
+    buf = b''
+    index = 0
+    start = 0
+    eof = False
+    while not eof:
+        chunk = fileobj.read(chunkSize)
+        eof = not chunk
+        # Drop what has been parsed, keeping the header before index
+        keep = max(0, index - 16)
+        buf = buf[keep:] + chunk
+        index -= keep
+        start -= keep
+
+        while True:
+            feIndex = findPacBlock(index, buf, start)
+            if feIndex is None:
+                # Markers in the last 20 bytes are found after the next read
+                index = max(index, len(buf) - 21)
+                break
+            block = getPacBlock(feIndex, buf, start)
+            if block is None:
+                index = feIndex
+                continue
+            if not eof and block[3] + STREAM_BLOCK_MARGIN >= len(buf):
+                # Decode the block once all of its text has been read
+                index = feIndex - 1
+                break
+            index = start = max(block[3], feIndex) + 1
+
+            for p in decodePacBlocks([block], buf, codePage, frameRate,
+                                     rich):
+                yield p
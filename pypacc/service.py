@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+
+# Conversion service: a small asyncio HTTP server, on a TCP port or a Unix
+# socket, converting PAC/FPC files posted to /convert. Parsing runs in a pool
+# of worker processes. At most queueDepth conversions are admitted at a time;
+# requests past that are rejected with 503 so that clients back off instead
+# of piling up. /metrics reports request latency percentiles and the queue.
+#
+#     python3 -m pypacc.service --port 8080 --jobs 4 --queue-depth 16
+#     curl --data-binary @film.pac 'http://127.0.0.1:8080/convert?format=srt'
+
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from optparse import OptionParser
+from urllib.parse import parse_qsl, urlsplit
+import asyncio
+import json
+import multiprocessing
+import sys
+import time
+
+from .codecs import OUTPUT_ENCODING, OUTPUT_ERRORS
+from .errors import PacError
+from .parser import (DETECT_SAMPLE_SIZE, iterPacParagraphs,
+                     paragraphsFrameRate, uniqueParagraphs)
+from .timecode import DEFAULT_FRAME_RATE, FRAME_RATE_AUTO, getFrameRate
+from .writers import formatOut
+
+
+# Conversions admitted at once (waiting or running), per worker process
+SERVICE_QUEUE_FACTOR = 4
+
+# Largest file accepted, in bytes
+SERVICE_MAX_SIZE = 64 * 2 ** 20
+
+# Number of recent conversion requests the latency percentiles are computed
+# over (requests rejected with 503 are left out)
+LATENCY_WINDOW = 1024
+
+# Latency percentiles reported by /metrics
+LATENCY_PERCENTILES = [50, 90, 99]
+
+# Start method of the worker processes. Workers are started when the first
+# conversions come in, and forked from the service they would inherit the
+# client sockets open at that moment, keeping the connections open after the
+# service closes them.
+SERVICE_START_METHOD = ('forkserver' if 'forkserver' in
+                        multiprocessing.get_all_start_methods() else 'spawn')
+
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE_TIMEOUT = 30
+
+# Output formats: (writeParagraphs format, content type)
+SERVICE_FORMATS = {'srt': ('SRT', 'application/x-subrip; charset=utf-8'),
+                   'vtt': ('VTT', 'text/vtt; charset=utf-8'),
+                   'ttml': ('TTML', 'application/ttml+xml; charset=utf-8'),
+                   'stl': ('STL', 'application/octet-stream'),
+                   'text': ('text', 'text/plain; charset=utf-8'),
+                   'json': (None, 'application/json')}
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 411: 'Length Required',
+                413: 'Payload Too Large', 422: 'Unprocessable Entity',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HTTPError(Exception):
+    """An error answered with an HTTP status"""
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+def convertBytes(data, codePage, outFormat, sampleSize,
+                 frameRate=DEFAULT_FRAME_RATE):
+    """
+    Convert the bytes of a PAC/FPC file in a worker process,
+    return the encoded output
+    """
+
+    if codePage:
+        paragraphs = uniqueParagraphs(iterPacParagraphs(data, codePage,
+                                                        frameRate))
+        encoding, confidence = codePage, None
+    else:
+        from .detect import detectEncoding
+        paragraphs, encoding, confidence = detectEncoding(data, sampleSize,
+                                                          frameRate)
+
+    writerFormat = SERVICE_FORMATS[outFormat][0]
+    if writerFormat is None:
+        text = json.dumps({'encoding': encoding,
+                           'confidence': confidence,
+                           'paragraphs': [
+                               {'start': p.startTime.totalMilliseconds,
+                                'end': p.endTime.totalMilliseconds,
+                                'text': p.text} for p in paragraphs]},
+                          ensure_ascii=False)
+    else:
+        if frameRate == FRAME_RATE_AUTO:
+            frameRate = paragraphsFrameRate(paragraphs)
+        text = formatOut(paragraphs, writerFormat, frameRate)
+        if isinstance(text, bytes):
+            return text
+
+    return text.encode(OUTPUT_ENCODING, OUTPUT_ERRORS)
+
+
+def percentile(sortedValues, percent):
+    """Nearest-rank percentile of a sorted list"""
+
+    if not sortedValues:
+        return None
+    rank = max(int(round(percent / 100.0 * len(sortedValues))), 1)
+    return sortedValues[rank - 1]
+
+
+class ConversionService(object):
+    """
+    HTTP conversion service running the parser in a pool of jobs worker
+    processes, with at most queueDepth conversions admitted at a time
+    """
+
+    def __init__(self, jobs, queueDepth=None, maxSize=SERVICE_MAX_SIZE,
+                 sampleSize=DETECT_SAMPLE_SIZE):
+        self.jobs = jobs
+        self.queueDepth = queueDepth or jobs * SERVICE_QUEUE_FACTOR
+        self.maxSize = maxSize
+        self.sampleSize = sampleSize
+        self.pool = None
+        self.server = None
+        self.admitted = 0  # Conversions waiting for or running on a worker
+        self.requests = 0
+        self.rejected = 0
+        self.statuses = {}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.started = time.time()
+
+    async def start(self, host='127.0.0.1', port=8080, unixPath=None):
+        self.pool = ProcessPoolExecutor(
+            self.jobs, mp_context=multiprocessing.get_context(
+                SERVICE_START_METHOD))
+        if unixPath:
+            self.server = await asyncio.start_unix_server(self.handle,
+                                                          unixPath)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one connection"""
+
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self.readRequest(reader),
+                                                     KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError,
+                        ConnectionError):
+                    break
+                except HTTPError as e:
+                    # The body cannot be told from the next request: answered,
+                    # then the connection is closed
+                    self.writeResponse(writer, *self.errorResponse(e),
+                                       keepAlive=False)
+                    await writer.drain()
+                    self.countRequest(e.status)
+                    break
+                if request is None:
+                    break
+                start = time.monotonic()
+                method, target, headers, body = request
+                try:
+                    status, contentType, data = await self.route(method,
+                                                                 target,
+                                                                 headers,
+                                                                 body)
+                except HTTPError as e:
+                    status, contentType, data = self.errorResponse(e)
+                keepAlive = headers.get('connection', '').lower() != 'close'
+                self.writeResponse(writer, status, contentType, data,
+                                   keepAlive)
+                await writer.drain()
+                if target.startswith('/convert') and status != 503:
+                    self.latencies.append(time.monotonic() - start)
+                self.countRequest(status)
+                if not keepAlive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def countRequest(self, status):
+        self.requests += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def readRequest(self, reader):
+        """
+        Read a request, return (method, target, headers, body) or None.
+        Raise HTTPError if its Content-Length is not a number of bytes.
+        """
+
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise ConnectionError('Malformed request line')
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        body = b''
+        length = headers.get('content-length')
+        if length is not None:
+            if not (length.isascii() and length.isdigit()):
+                raise HTTPError(400, 'Invalid Content-Length: ' + length)
+            length = int(length)
+            if length > self.maxSize:
+                # Too large to read: answered without reading the body
+                headers['connection'] = 'close'
+                return method, target, headers, None
+            body = await reader.readexactly(length)
+        elif 'transfer-encoding' in headers:
+            headers['connection'] = 'close'
+            body = None
+
+        return method, target, headers, body
+
+    def errorResponse(self, error):
+        """Return the (status, content type, data) of an HTTPError"""
+
+        return (error.status, 'text/plain; charset=utf-8',
+                (str(error) + '\n').encode('utf-8'))
+
+    def writeResponse(self, writer, status, contentType, data, keepAlive):
+        head = ['HTTP/1.1 {0} {1}'.format(status, HTTP_REASONS[status]),
+                'Content-Type: ' + contentType,
+                'Content-Length: {0}'.format(len(data)),
+                'Connection: ' + ('keep-alive' if keepAlive else 'close')]
+        if status == 503:
+            head.append('Retry-After: 1')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') +
+                     data)
+
+    async def route(self, method, target, headers, body):
+        """Return the (status, content type, data) of a request"""
+
+        url = urlsplit(target)
+        if url.path == '/metrics':
+            if method != 'GET':
+                raise HTTPError(405, 'Use GET')
+            return (200, 'application/json',
+                    json.dumps(self.metrics(), indent=2).encode('utf-8'))
+        if url.path != '/convert':
+            raise HTTPError(404, 'Not found: ' + url.path)
+        if method != 'POST':
+            raise HTTPError(405, 'POST the PAC/FPC file to /convert')
+        if body is None:
+            if 'content-length' in headers:
+                raise HTTPError(413, 'Files are limited to {0} bytes'.format(
+                    self.maxSize))
+            raise HTTPError(411, 'Content-Length is required')
+
+        query = dict(parse_qsl(url.query))
+        outFormat = query.get('format', 'srt').lower()
+        if outFormat not in SERVICE_FORMATS:
+            raise HTTPError(400, 'Invalid output format: ' + outFormat)
+        codePage = query.get('encoding', '').lower() or None
+        try:
+            sampleSize = int(query.get('sample', self.sampleSize))
+        except ValueError:
+            raise HTTPError(400, 'Invalid sample size')
+        frameRate = query.get('fps', DEFAULT_FRAME_RATE.name)
+        if frameRate.lower() == FRAME_RATE_AUTO:
+            frameRate = FRAME_RATE_AUTO
+        else:
+            try:
+                frameRate = getFrameRate(frameRate)
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+
+        data = await self.convert(body, codePage, outFormat, sampleSize,
+                                  frameRate)
+        return 200, SERVICE_FORMATS[outFormat][1], data
+
+    async def convert(self, body, codePage, outFormat, sampleSize,
+                      frameRate):
+        """Convert a file in the worker pool, if the queue has room"""
+
+        if self.admitted >= self.queueDepth:
+            self.rejected += 1
+            raise HTTPError(503, 'Conversion queue is full')
+
+        self.admitted += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, convertBytes, body,
+                                              codePage, outFormat, sampleSize,
+                                              frameRate)
+        except PacError as e:
+            raise HTTPError(422, str(e))
+        except Exception as e:
+            raise HTTPError(500, '{0}: {1}'.format(type(e).__name__, e))
+        finally:
+            self.admitted -= 1
+
+    def metrics(self):
+        """Return the service metrics as a dict"""
+
+        latencies = sorted(self.latencies)
+        return {'uptime_s': time.time() - self.started,
+                'requests': self.requests,
+                'rejected': self.rejected,
+                'statuses': dict((str(status), count) for status, count in
+                                 sorted(self.statuses.items())),
+                'workers': self.jobs,
+                'queue_depth': self.queueDepth,
+                'in_flight': self.admitted,
+                'queue_length': max(self.admitted - self.jobs, 0),
+                'latency_ms': dict(
+                    ('p{0}'.format(p),
+                     None if not latencies else
+                     percentile(latencies, p) * 1000)
+                    for p in LATENCY_PERCENTILES),
+                'latency_window': len(latencies)}
+
+
+async def serve(service, host, port, unixPath):
+    server = await service.start(host, port, unixPath)
+    where = unixPath or '{0}:{1}'.format(host, port)
+    print('Serving on {0} ({1} workers, queue depth {2})'.format(
+        where, service.jobs, service.queueDepth), file=sys.stderr)
+    try:
+        await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main():
+    usage = "usage: python3 -m pypacc.service [options]"
+    parser = OptionParser(usage=usage)
+    parser.add_option("--host", dest="host", default="127.0.0.1", help="Address to listen on, default: %default")
+    parser.add_option("-p", "--port", dest="port", type="int", default=8080, help="Port to listen on, default: %default")
+    parser.add_option("-u", "--unix", dest="unixPath", help="Listen on this Unix socket instead of a port")
+    parser.add_option("-j", "--jobs", dest="jobs", type="int", default=multiprocessing.cpu_count(), help="Number of worker processes, default: %default")
+    parser.add_option("-q", "--queue-depth", dest="queueDepth", type="int", help="Conversions admitted at once before requests are rejected with 503, default: {0} per worker".format(SERVICE_QUEUE_FACTOR))
+    parser.add_option("-m", "--max-size", dest="maxSize", type="int", default=SERVICE_MAX_SIZE // 2 ** 20, help="Largest file accepted in MB, default: %default")
+    parser.add_option("-s", "--sample", dest="sampleSize", type="int", default=DETECT_SAMPLE_SIZE, help="Number of subtitles sampled to detect the encoding (0 for all), default: %default")
+    (options, args) = parser.parse_args()
+
+    service = ConversionService(max(options.jobs, 1), options.queueDepth,
+                                options.maxSize * 2 ** 20, options.sampleSize)
+    try:
+        asyncio.run(serve(service, options.host, options.port,
+                          options.unixPath))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
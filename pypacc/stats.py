@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+# Parser statistics: counters and per-phase timings, collected between
+# startStats() and stopStats(). Collection is off by default and the parser
+# only checks STATS once per pass when it is.
+
+
+import codecs
+import time
+
+
+class ParseStats(object):
+    """
+    Counters and per-phase timings of the parser, collected between
+    startStats() and stopStats()
+    """
+
+    COUNTERS = [('bytesScanned', 'bytes scanned'),
+                ('bytesSkipped', 'bytes outside blocks'),
+                ('blocks', 'blocks found'),
+                ('markersRejected', 'markers without a valid header'),
+                ('truncatedBlocks', 'blocks running into the end of file'),
+                ('invalidBytes', 'undecodable bytes dropped'),
+                ('decodeErrors', 'UnicodeDecodeErrors while detecting'),
+                ('encodingFallbacks', 'utf-8 detection fallbacks'),
+                ('emptyParagraphs', 'empty paragraphs dropped'),
+                ('duplicates', 'duplicate paragraphs dropped')]
+
+    def __init__(self):
+        for name, description in self.COUNTERS:
+            setattr(self, name, 0)
+        self.timings = {}
+
+    def timer(self, phase):
+        return PhaseTimer(self.timings, phase)
+
+    def report(self):
+        lines = ['{0:>12}  {1}'.format(getattr(self, name), description)
+                 for name, description in self.COUNTERS]
+        for phase in sorted(self.timings):
+            lines.append('{0:>11.4f}s  {1}'.format(self.timings[phase], phase))
+        return '\n'.join(lines)
+
+
+class PhaseTimer(object):
+    """Context manager adding the time spent in a phase to timings"""
+
+    def __init__(self, timings, phase):
+        self.timings = timings
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.time() - self.start
+        self.timings[self.phase] = self.timings.get(self.phase, 0.0) + elapsed
+
+
+class NullTimer(object):
+    """Context manager doing nothing, for when no stats are collected"""
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+# ParseStats being collected, or None
+STATS = None
+
+
+def startStats():
+    """Start collecting parser statistics, return the ParseStats"""
+
+    global STATS
+    STATS = ParseStats()
+    return STATS
+
+
+def stopStats():
+    """Stop collecting parser statistics, return the ParseStats"""
+
+    global STATS
+    stats, STATS = STATS, None
+    return stats
+
+
+def phaseTimer(phase):
+    """Time a phase if statistics are being collected"""
+
+    if STATS is None:
+        return NULL_TIMER
+    return STATS.timer(phase)
+
+
+def countInvalidBytes(error):
+    """Codec error handler dropping undecodable bytes, and counting them"""
+
+    if STATS is not None:
+        STATS.invalidBytes += error.end - error.start
+    return '', error.end
+
+
+codecs.register_error('pacignore', countInvalidBytes)
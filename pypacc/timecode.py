@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+# Frame rates and PAC time codes. A PAC time code is two little-endian words,
+# hours * 100 + minutes and seconds * 100 + frames. The parser keeps them
+# packed in one integer, and times are frame counts until they are written
+# out in milliseconds.
+
+
+import math
+
+
+# Name of the frame rate detected from the time codes of a file
+FRAME_RATE_AUTO = 'auto'
+
+# Chance of taking a 25 fps file for a 24 fps one that detectFrameRate
+# accepts: a 25 fps time code misses frame 24 with probability 24/25, so
+# frame numbers that never reach 24 are taken to mean a 24 fps file only
+# among enough distinct time codes that (24/25) ** codes is below it
+FPS_DETECT_ERROR = 1e-4
+FPS_DETECT_MIN_CODES = int(math.ceil(math.log(FPS_DETECT_ERROR) /
+                                     math.log(24 / 25.0)))
+
+
+class FrameRate(object):
+    """
+    A frame rate of base frames per second of time code, running at
+    base * 1000 / denominator frames per second (denominator 1001 for the
+    NTSC rates); drop-frame time codes skip frames 0 and 1 of every minute
+    but every tenth
+    """
+
+    __slots__ = ('name', 'base', 'denominator', 'dropFrame')
+
+    def __init__(self, name, base, denominator=1000, dropFrame=False):
+        self.name = name
+        self.base = base
+        self.denominator = denominator
+        self.dropFrame = dropFrame
+
+    def framesFromPac(self, code):
+        """Return the frame count of a packed PAC time code"""
+
+        hours, minutes = divmod(code >> 16, 100)
+        seconds, frames = divmod((code & 0xffff) % 10000, 100)
+        totalMinutes = hours * 60 + minutes
+        frames += (totalMinutes * 60 + seconds) * self.base
+        if self.dropFrame:
+            frames -= 2 * (totalMinutes - totalMinutes // 10)
+        return frames
+
+    def pacFromFrames(self, frames):
+        """Return the packed PAC time code of a frame count"""
+
+        if self.dropFrame:
+            # Put back the frame numbers drop-frame time codes skip
+            dropped = 2 * self.base // 30
+            perMinute = self.base * 60 - dropped
+            perTenMinutes = perMinute * 10 + dropped
+            tens, rest = divmod(frames, perTenMinutes)
+            frames += dropped * 9 * tens
+            if rest > dropped:
+                frames += dropped * ((rest - dropped) // perMinute)
+        seconds, frames = divmod(frames, self.base)
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        return (hours * 100 + minutes) << 16 | (seconds * 100 + frames)
+
+    def milliseconds(self, frames):
+        """Return the time of a frame count in whole milliseconds"""
+
+        return frames * self.denominator // self.base
+
+    def framesFromMilliseconds(self, milliseconds):
+        """
+        Return the frame count of a time in milliseconds (the inverse of
+        milliseconds(), which rounds down)
+        """
+
+        return -(-milliseconds * self.base // self.denominator)
+
+    def __repr__(self):
+        return 'FrameRate({0!r})'.format(self.name)
+
+    def __reduce__(self):
+        # Known rates unpickle to the same object (e.g. in worker processes)
+        if FRAME_RATES.get(self.name) is self:
+            return getFrameRate, (self.name,)
+        return FrameRate, (self.name, self.base, self.denominator,
+                           self.dropFrame)
+
+
+FRAME_RATES = dict((rate.name, rate) for rate in [
+    FrameRate('23.976', 24, 1001),
+    FrameRate('24', 24),
+    FrameRate('25', 25),
+    FrameRate('29.97', 30, 1001),
+    FrameRate('29.97DF', 30, 1001, dropFrame=True),
+    FrameRate('30', 30)])
+
+# Frame rate of files whose frame rate is not given (PAL)
+DEFAULT_FRAME_RATE = FRAME_RATES['25']
+
+# Milliseconds as a frame rate, for times that are not frame counts
+MILLISECONDS = FrameRate('ms', 1000)
+
+
+def getFrameRate(frameRate):
+    """Return the FrameRate of a name such as '25' or '29.97DF'"""
+
+    if isinstance(frameRate, FrameRate):
+        return frameRate
+    name = str(frameRate).upper()
+    if name == '23.98':
+        name = '23.976'
+    if name not in FRAME_RATES:
+        raise ValueError('Unknown frame rate: {0} (use {1} or {2})'.format(
+            frameRate, ', '.join(sorted(FRAME_RATES, key=frameRateOrder)),
+            FRAME_RATE_AUTO))
+    return FRAME_RATES[name]
+
+
+def frameRateOrder(name):
+    return float(name.rstrip('DF')), name
+
+
+def detectFrameRate(blocks):
+    """
+    Guess the frame rate of a file from the frame numbers of its blocks'
+    time codes (the PAC header has no frame rate). Frame numbers past 24 mean
+    30 fps (drop-frame cannot be told apart, give it explicitly), and files
+    with at least FPS_DETECT_MIN_CODES distinct time codes but no frame 24
+    are taken to be 24 fps.
+    """
+
+    maxFrame = -1
+    codes = set()
+    for block in blocks:
+        for code in block[:2]:
+            frame = (code & 0xffff) % 100
+            if frame > maxFrame:
+                maxFrame = frame
+            codes.add(code)
+
+    if maxFrame >= 30:
+        return DEFAULT_FRAME_RATE  # Not frame numbers of any known rate
+    if maxFrame >= 25:
+        return FRAME_RATES['30']
+    if maxFrame == 23 and len(codes) >= FPS_DETECT_MIN_CODES:
+        return FRAME_RATES['24']
+    return DEFAULT_FRAME_RATE
@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+
+# Paragraphs, time codes and SubtitleTrack, the column store of a parsed file.
+
+
+from array import array
+import operator
+
+from .timecode import MILLISECONDS
+
+
+# Array type of the times in a SubtitleTrack (64-bit)
+TIME_ARRAY_TYPE = 'q'
+
+# Alignment bytes of left and right aligned lines (other values are centred)
+PAC_ALIGN_LEFT = 0x01
+PAC_ALIGN_RIGHT = 0x00
+
+# Vertical positions below this are at the top of the screen
+PAC_TOP_POSITION = 5
+
+
+class Paragraph(object):
+    __slots__ = ('startTime', 'endTime', 'text')
+
+    def __init__(self, startTime=None, endTime=None, text=''):
+        self.startTime = startTime
+        self.endTime = endTime
+        self.text = text
+
+    def __str__(self):
+        return '{0} {1} {2}'.format(self.startTime, self.endTime, self.text)
+
+    def __eq__(self, other):
+        if self.text == other.text:
+            return True
+        else:
+            return False
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class Layout(object):
+    """
+    Position and formatting of a block, as stored in the file: the vertical
+    position byte, and the alignment and format code bytes of each line.
+    lineLengths are the lengths of the lines in the paragraph's text, where
+    they are joined by spaces.
+    """
+
+    __slots__ = ('verticalPosition', 'alignments', 'formats', 'lineLengths')
+
+    def __init__(self, verticalPosition, alignments=b'', formats=b'',
+                 lineLengths=()):
+        self.verticalPosition = verticalPosition
+        self.alignments = bytes(alignments)
+        self.formats = bytes(formats)
+        self.lineLengths = tuple(lineLengths)
+
+    def splitLines(self, text):
+        """
+        Split text at its line breaks, return [text] if lineLengths do not
+        fit it
+        """
+
+        lines = []
+        index = 0
+        for length in self.lineLengths:
+            if lines:
+                if text[index:index + 1] != ' ':
+                    return [text]
+                index += 1
+            lines.append(text[index:index + length])
+            index += length
+        if index != len(text) or not lines:
+            return [text]
+        return lines
+
+    @property
+    def alignment(self):
+        """'left', 'right' or 'center', from the first line"""
+
+        alignment = self.alignments[0] if self.alignments else None
+        if alignment == PAC_ALIGN_LEFT:
+            return 'left'
+        if alignment == PAC_ALIGN_RIGHT:
+            return 'right'
+        return 'center'
+
+    @property
+    def top(self):
+        return self.verticalPosition < PAC_TOP_POSITION
+
+    def __repr__(self):
+        return 'Layout({0!r}, {1!r}, {2!r}, {3!r})'.format(
+            self.verticalPosition, self.alignments, self.formats,
+            self.lineLengths)
+
+    def __eq__(self, other):
+        return (isinstance(other, Layout) and
+                self.verticalPosition == other.verticalPosition and
+                self.alignments == other.alignments and
+                self.formats == other.formats and
+                self.lineLengths == other.lineLengths)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class RichParagraph(Paragraph):
+    """A Paragraph with the Layout of its block"""
+
+    __slots__ = ('layout',)
+
+    def __init__(self, startTime=None, endTime=None, text='', layout=None):
+        Paragraph.__init__(self, startTime, endTime, text)
+        self.layout = layout
+
+
+class TimeCode(object):
+    """
+    A time, stored as a frame count at a FrameRate (milliseconds are counted
+    as frames of the MILLISECONDS rate) and converted to milliseconds on use
+    """
+
+    __slots__ = ('frames', 'frameRate')
+
+    def __init__(self, hours=0, minutes=0, seconds=0, milliseconds=0):
+        self.frames = (((int(hours) * 60 + int(minutes)) * 60 +
+                        int(seconds)) * 1000 + int(milliseconds))
+        self.frameRate = MILLISECONDS
+
+    @classmethod
+    def fromMilliseconds(cls, totalMilliseconds):
+        return cls.fromFrames(totalMilliseconds, MILLISECONDS)
+
+    @classmethod
+    def fromFrames(cls, frames, frameRate):
+        timeCode = cls.__new__(cls)
+        timeCode.frames = frames
+        timeCode.frameRate = frameRate
+        return timeCode
+
+    @property
+    def totalMilliseconds(self):
+        return self.frameRate.milliseconds(self.frames)
+
+    @property
+    def hours(self):
+        return self.totalMilliseconds // 3600000
+
+    @property
+    def minutes(self):
+        return self.totalMilliseconds // 60000 % 60
+
+    @property
+    def seconds(self):
+        return self.totalMilliseconds // 1000 % 60
+
+    @property
+    def milliseconds(self):
+        return self.totalMilliseconds % 1000
+
+    def __str__(self):
+        return formatTime(self.totalMilliseconds)
+
+    def __eq__(self, other):
+        return self.totalMilliseconds == other.totalMilliseconds
+
+    def __ne__(self, other):
+        return not self == other
+
+
+def formatTime(milliseconds, separator=':'):
+    """Format milliseconds as HH:MM:SS:mmm, using separator before mmm"""
+
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return '%02d:%02d:%02d%s%03d' % (hours, minutes, seconds, separator,
+                                     milliseconds)
+
+
+def parseTime(text):
+    """
+    Parse a time written as HH:MM:SS, with optional milliseconds after a
+    ':', '.' or ',' (as formatTime writes them), into milliseconds
+    """
+
+    fields = text.strip().replace(',', ':').replace('.', ':').split(':')
+    try:
+        hours, minutes, seconds = map(int, fields[:3])
+        milliseconds = int(fields[3]) if len(fields) == 4 else 0
+    except ValueError:
+        raise ValueError('Invalid time: {0}'.format(text))
+    if len(fields) > 4 or not 0 <= minutes < 60 or not 0 <= seconds < 60:
+        raise ValueError('Invalid time: {0}'.format(text))
+    return ((hours * 60 + minutes) * 60 + seconds) * 1000 + milliseconds
+
+
+def formatTimes(milliseconds, separator=':'):
+    """formatTime of a whole column of times, return a list"""
+
+    times = []
+    append = times.append
+    for seconds in milliseconds:
+        seconds, ms = divmod(seconds, 1000)
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        append('%02d:%02d:%02d%s%03d' % (hours, minutes, seconds, separator,
+                                         ms))
+    return times
+
+
+class SubtitleTrack(object):
+    """
+    Paragraphs stored by column: start and end times (in milliseconds) in
+    arrays, and texts in a list. A rich track also keeps the Layout of each
+    paragraph (layouts is None otherwise). Iterating over a track gives
+    Paragraphs, or RichParagraphs.
+    """
+
+    __slots__ = ('starts', 'ends', 'texts', 'layouts')
+
+    def __init__(self, paragraphs=(), rich=False):
+        self.starts = array(TIME_ARRAY_TYPE)
+        self.ends = array(TIME_ARRAY_TYPE)
+        self.texts = []
+        self.layouts = [] if rich else None
+        for paragraph in paragraphs:
+            self.append(paragraph)
+
+    def append(self, paragraph):
+        self.starts.append(paragraph.startTime.totalMilliseconds)
+        self.ends.append(paragraph.endTime.totalMilliseconds)
+        self.texts.append(paragraph.text)
+        if self.layouts is not None:
+            self.layouts.append(getattr(paragraph, 'layout', None))
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        if self.layouts is not None:
+            return RichParagraph(TimeCode.fromMilliseconds(self.starts[i]),
+                                 TimeCode.fromMilliseconds(self.ends[i]),
+                                 self.texts[i], self.layouts[i])
+        return Paragraph(TimeCode.fromMilliseconds(self.starts[i]),
+                         TimeCode.fromMilliseconds(self.ends[i]),
+                         self.texts[i])
+
+    def __iter__(self):
+        fromMilliseconds = TimeCode.fromMilliseconds
+        if self.layouts is not None:
+            for start, end, text, layout in zip(self.starts, self.ends,
+                                                self.texts, self.layouts):
+                yield RichParagraph(fromMilliseconds(start),
+                                    fromMilliseconds(end), text, layout)
+            return
+        for start, end, text in zip(self.starts, self.ends, self.texts):
+            yield Paragraph(fromMilliseconds(start), fromMilliseconds(end),
+                            text)
+
+    def shift(self, milliseconds):
+        """Move every paragraph by milliseconds (times stop at 0)"""
+
+        self.starts = array(TIME_ARRAY_TYPE,
+                            [max(t + milliseconds, 0) for t in self.starts])
+        self.ends = array(TIME_ARRAY_TYPE,
+                          [max(t + milliseconds, 0) for t in self.ends])
+
+    def scale(self, factor):
+        """Multiply every time by factor, e.g. to convert frame rates"""
+
+        self.starts = array(TIME_ARRAY_TYPE,
+                            [int(round(t * factor)) for t in self.starts])
+        self.ends = array(TIME_ARRAY_TYPE,
+                          [int(round(t * factor)) for t in self.ends])
+
+    def durations(self):
+        """Return the duration of each paragraph in milliseconds"""
+
+        return array(TIME_ARRAY_TYPE,
+                     map(operator.sub, self.ends, self.starts))
+
+    def overlaps(self):
+        """Return the indexes of paragraphs that end after the next starts"""
+
+        return [i for i, (end, start) in
+                enumerate(zip(self.ends, self.starts[1:]))
+                if end > start]
@@ -0,0 +1,638 @@
+# -*- coding: utf-8 -*-
+
+# Output formats of the paragraphs of a file. Each format is a SubtitleWriter
+# registered in WRITERS; writeFormats writes several formats in a single pass
+# over the paragraphs.
+
+
+from io import BytesIO, StringIO
+from itertools import repeat
+from xml.sax.saxutils import escape as escapeXML
+import datetime
+import struct
+import sys
+import unicodedata
+
+from .codecs import (OUTPUT_ENCODING, OUTPUT_ERRORS, getTextEncoder,
+                     guessCodePage)
+from .errors import PacError
+from .parser import PAC_BLOCK_HEADER
+from .timecode import DEFAULT_FRAME_RATE
+from .track import SubtitleTrack, formatTime, formatTimes
+
+
+# Buffer size of the files written by writeOut and batch mode
+OUTPUT_BUFFER_SIZE = 65536
+
+
+# One SRT cue: number, start and end times, text
+SRT_CUE = '{0}\n{1} --> {2}\n{3}\n\n'.format
+
+# One WebVTT cue: start and end times, text, and cue settings
+VTT_CUE = '{0} --> {1}{3}\n{2}\n\n'.format
+
+# WebVTT cue settings of the top of the screen and of each alignment
+VTT_TOP = ' line:0'
+VTT_ALIGNMENTS = {'left': ' align:left', 'right': ' align:right',
+                  'center': ''}
+
+# Characters escaped in WebVTT cue text
+VTT_ESCAPES = {ord('&'): '&amp;', ord('<'): '&lt;', ord('>'): '&gt;'}
+
+# Start and end of a TTML document (IMSC1 text profile), and one cue
+TTML_HEAD = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+             '<tt xmlns="http://www.w3.org/ns/ttml"'
+             ' xmlns:ttp="http://www.w3.org/ns/ttml#parameter"'
+             ' xmlns:tts="http://www.w3.org/ns/ttml#styling"'
+             ' ttp:profile="http://www.w3.org/ns/ttml/profile/imsc1/text"'
+             ' ttp:timeBase="media" xml:lang="">\n'
+             '  <head>\n'
+             '    <layout>\n'
+             '      <region xml:id="bottom" tts:origin="10% 10%"'
+             ' tts:extent="80% 80%" tts:displayAlign="after"'
+             ' tts:textAlign="center"/>\n'
+             '      <region xml:id="top" tts:origin="10% 10%"'
+             ' tts:extent="80% 80%" tts:displayAlign="before"'
+             ' tts:textAlign="center"/>\n'
+             '    </layout>\n'
+             '  </head>\n'
+             '  <body region="bottom">\n'
+             '    <div>\n')
+TTML_TAIL = '''    </div>
+  </body>
+</tt>
+'''
+TTML_CUE = '      <p begin="{0}" end="{1}"{3}>{2}</p>\n'.format
+
+
+# EBU-STL (EBU Tech 3264) General Subtitle Information block: code page,
+# disk format, display standard (undefined), character code table, language
+# (undefined), 6 empty titles, creation and revision dates, revision number,
+# numbers of TTI blocks and subtitles, 1 group, 40 characters by 23 rows,
+# time code status, programme start and first in-cue time codes, 1 disk,
+# country (blank), and empty publisher, editor, contact, spare bytes and
+# user area (1024 bytes)
+STL_GSI = ('850STL{0:02d}.01 {1}00' + ' ' * 192 + ' ' * 16 +
+           '{2}{2}00{3:05d}{4:05d}00140231' + '00000000{5}' + '11' +
+           ' ' * 3 + ' ' * 96 + ' ' * 75 + ' ' * 576).format
+
+# EBU-STL Text and Timing Information block: group, subtitle number,
+# extension block number, cumulative status, time code in and out,
+# vertical position, justification, comment flag and text field
+STL_TTI = struct.Struct('<BHBB4s4sBBB112s')
+
+# Size of the text field of a TTI block
+STL_TEXT_SIZE = 112
+
+# Extension block number of the last TTI block of a subtitle
+STL_LAST_BLOCK = 0xff
+
+# Teletext row of the last line of a subtitle, and rows between lines
+STL_BOTTOM_ROW = 22
+STL_ROW_STEP = 2
+
+# Teletext row of subtitles at the top of the screen
+STL_TOP_ROW = 1
+
+# Justification codes of each alignment
+STL_JUSTIFICATIONS = {'left': 1, 'center': 2, 'right': 3}
+STL_CENTRED = STL_JUSTIFICATIONS['center']
+
+# EBU-STL line break and unused space in the text field
+STL_NEWLINE = b'\x8a'
+STL_FILLER = b'\x8f'
+
+# Start and end of a PAC/FPC file
+PAC_FILE_HEADER = b'\x01' + b'\x00' * 20
+PAC_FILE_TRAILER = b'\xff' + b'\x00' * 11 + b'\x11\x00' + b'dummy end of file'
+
+# Vertical position, alignment and format code of blocks without a Layout
+PAC_BOTTOM_POSITION = 0x0a
+PAC_CENTRED = 0x02
+PAC_FORMAT = 0x03
+
+# Length of the longest text a block can hold, with its vertical position
+PAC_MAX_TEXT_LENGTH = 0xffff
+
+# Block numbers in each byte of a block's number: 0xFE is skipped, so that a
+# number is never taken for a block marker
+PAC_NUMBER_BASE = 0xff
+
+# Bytes between the vertical position and the 0xFE marker of FPC blocks
+FPC_PADDING = b'\x80\x80\x80'
+
+# Codes after the alignment and format code of the first and of the next
+# lines of W16 (big5) text, and before each line of FPC text
+W16_FIRST_LINE = b'\x1fW16\x02'
+W16_NEXT_LINE = b'\x1fW16\x02\x00\x00'
+FPC_LINE = b'\x1f'
+
+# Character code tables: Latin (ISO 6937) and Latin/Cyrillic (ISO 8859-5)
+STL_LATIN = '00'
+STL_CYRILLIC = '01'
+
+# ISO 6937 non-spacing diacritics, written before the letter they modify
+ISO6937_DIACRITICS = {'\u0300': 0xc1, '\u0301': 0xc2, '\u0302': 0xc3,
+                      '\u0303': 0xc4, '\u0304': 0xc5, '\u0306': 0xc6,
+                      '\u0307': 0xc7, '\u0308': 0xc8, '\u030a': 0xca,
+                      '\u0327': 0xcb, '\u030b': 0xcd, '\u0328': 0xce,
+                      '\u030c': 0xcf}
+
+# ISO 6937 characters that are not a letter and a diacritic
+ISO6937_SPECIALS = {'¡': 0xa1, '¢': 0xa2, '£': 0xa3, '¥': 0xa5, '§': 0xa7,
+                    '«': 0xab, '°': 0xb0, '±': 0xb1, '²': 0xb2, '³': 0xb3,
+                    '×': 0xb4, 'µ': 0xb5, '¶': 0xb6, '·': 0xb7, '÷': 0xb8,
+                    '»': 0xbb, '¼': 0xbc, '½': 0xbd, '¾': 0xbe, '¿': 0xbf,
+                    '‘': 0xa9, '’': 0xb9, '“': 0xaa, '”': 0xba,
+                    '♪': 0xd5, 'Æ': 0xe1, 'Đ': 0xe2, 'Ø': 0xe9, 'Œ': 0xea,
+                    'Þ': 0xec, 'Ł': 0xe8, 'æ': 0xf1, 'đ': 0xf2, 'ð': 0xf3,
+                    'ı': 0xf5, 'ł': 0xf8, 'ø': 0xf9, 'œ': 0xfa, 'ß': 0xfb,
+                    'þ': 0xfc, '\n': STL_NEWLINE[0]}
+
+# Built by iso6937Translation when EBU-STL text is first encoded
+ISO6937_TRANSLATION = None
+
+
+def iso6937Translation():
+    """
+    Build the str.translate table of text to ISO 6937 bytes (as latin-1
+    characters). Latin letters with a diacritic are decomposed, characters
+    ISO 6937 does not have become '?'.
+    """
+
+    global ISO6937_TRANSLATION
+
+    if ISO6937_TRANSLATION is None:
+        table = dict((i, '?') for i in range(0x80, 0x100))
+        for i in range(0xa0, 0x250):
+            char = chr(i)
+            decomposed = unicodedata.normalize('NFD', char)
+            if (len(decomposed) == 2 and decomposed[0] < '\x80' and
+                    decomposed[1] in ISO6937_DIACRITICS):
+                table[i] = (chr(ISO6937_DIACRITICS[decomposed[1]]) +
+                            decomposed[0])
+        for char, code in ISO6937_SPECIALS.items():
+            table[ord(char)] = chr(code)
+        ISO6937_TRANSLATION = table
+
+    return ISO6937_TRANSLATION
+
+
+class SubtitleWriter(object):
+    """
+    An output format: begin() writes the header, writeCue() each cue (times
+    in milliseconds, and the Layout of rich paragraphs) and end() the rest
+    of the file to outf
+    """
+
+    # Extension of the files written, and whether they are bytes
+    extension = None
+    binary = False
+
+    def __init__(self, outf, frameRate=DEFAULT_FRAME_RATE, codePage=None):
+        self.outf = outf
+        self.write = outf.write
+        self.frameRate = frameRate
+        self.codePage = codePage
+
+    def begin(self):
+        pass
+
+    def writeCue(self, number, start, end, text, layout=None):
+        raise NotImplementedError
+
+    def end(self):
+        pass
+
+    def writeTrack(self, track):
+        """Write the cues of a SubtitleTrack"""
+
+        writeCue = self.writeCue
+        layouts = repeat(None) if track.layouts is None else track.layouts
+        for number, cue in enumerate(zip(track.starts, track.ends,
+                                         track.texts, layouts), 1):
+            writeCue(number, *cue)
+
+
+class LineWriter(SubtitleWriter):
+    """One paragraph per line: start and end times, text"""
+
+    extension = '.txt'
+
+    def writeCue(self, number, start, end, text, layout=None):
+        self.write('{0} {1} {2}\n'.format(formatTime(start), formatTime(end),
+                                          text))
+
+
+class TextWriter(SubtitleWriter):
+    """The text of the paragraphs only"""
+
+    extension = '.txt'
+
+    def writeCue(self, number, start, end, text, layout=None):
+        self.write(text)
+
+
+class SRTWriter(SubtitleWriter):
+    """SubRip"""
+
+    extension = '.srt'
+
+    def writeCue(self, number, start, end, text, layout=None):
+        self.write(SRT_CUE(number, formatTime(start, ','),
+                           formatTime(end, ','), text))
+
+    def writeTrack(self, track):
+        # The times are formatted a column at a time
+        write = self.write
+        for number, cue in enumerate(zip(formatTimes(track.starts, ','),
+                                         formatTimes(track.ends, ','),
+                                         track.texts), 1):
+            write(SRT_CUE(number, *cue))
+
+
+class VTTWriter(SubtitleWriter):
+    """WebVTT, with the position and alignment of rich paragraphs"""
+
+    extension = '.vtt'
+
+    def begin(self):
+        self.write('WEBVTT\n\n')
+
+    def writeCue(self, number, start, end, text, layout=None):
+        self.write(VTT_CUE(formatTime(start, '.'), formatTime(end, '.'),
+                           vttText(layoutText(text, layout)),
+                           vttSettings(layout)))
+
+    def writeTrack(self, track):
+        if track.layouts is not None:
+            return SubtitleWriter.writeTrack(self, track)
+        write = self.write
+        for cue in zip(formatTimes(track.starts, '.'),
+                       formatTimes(track.ends, '.'),
+                       map(vttText, track.texts)):
+            write(VTT_CUE(*cue, ''))
+
+
+def layoutText(text, layout):
+    """Return text with the line breaks its Layout records as newlines"""
+
+    if layout is None:
+        return text
+    return '\n'.join(layout.splitLines(text))
+
+
+def vttSettings(layout):
+    """Return the cue settings placing a cue as its Layout"""
+
+    if layout is None:
+        return ''
+    return (VTT_TOP if layout.top else '') + VTT_ALIGNMENTS[layout.alignment]
+
+
+def vttText(text):
+    """Escape cue text, and drop the blank lines that would end the cue"""
+
+    text = text.translate(VTT_ESCAPES)
+    if '\n\n' in text or text.startswith('\n') or text.endswith('\n'):
+        text = '\n'.join(line for line in text.split('\n') if line)
+    return text
+
+
+class TTMLWriter(SubtitleWriter):
+    """
+    TTML, in the IMSC1 text profile, with the position and alignment of
+    rich paragraphs
+    """
+
+    extension = '.ttml'
+
+    def begin(self):
+        self.write(TTML_HEAD)
+
+    def writeCue(self, number, start, end, text, layout=None):
+        attributes = ''
+        if layout is not None:
+            if layout.top:
+                attributes = ' region="top"'
+            if layout.alignment != 'center':
+                attributes += ' tts:textAlign="{0}"'.format(layout.alignment)
+        self.write(TTML_CUE(formatTime(start, '.'), formatTime(end, '.'),
+                            escapeXML(layoutText(text, layout)).replace(
+                                '\n', '<br/>'),
+                            attributes))
+
+    def end(self):
+        self.write(TTML_TAIL)
+
+
+class STLWriter(SubtitleWriter):
+    """
+    EBU-STL, at 25 or 30 fps, with the position and justification of rich
+    paragraphs. Cues are collected and the file is written in end(), once
+    the numbers in the header and the character table are known.
+    """
+
+    extension = '.stl'
+    binary = True
+
+    def begin(self):
+        self.cues = []
+
+    def writeCue(self, number, start, end, text, layout=None):
+        self.cues.append((start, end, text, layout))
+
+    def end(self):
+        fps = 25 if self.frameRate.base == 25 else 30
+        table = STL_LATIN
+        if any('\u0400' <= char <= '\u04ff' for cue in self.cues
+               for char in cue[2]):
+            table = STL_CYRILLIC
+
+        blocks = []
+        subtitles = 0
+        for start, end, text, layout in self.cues:
+            text = encodeSTLText(layoutText(text, layout), table)
+            if not text:
+                continue
+            timeIn = stlTimeCode(start, fps)
+            timeOut = stlTimeCode(end, fps)
+            justification = STL_CENTRED
+            if layout is None or not layout.top:
+                row = max(STL_BOTTOM_ROW -
+                          STL_ROW_STEP * text.count(STL_NEWLINE), STL_TOP_ROW)
+            else:
+                row = STL_TOP_ROW
+            if layout is not None:
+                justification = STL_JUSTIFICATIONS[layout.alignment]
+            # Text longer than a block continues in extension blocks
+            extensions = range(0, len(text), STL_TEXT_SIZE)
+            for extension, offset in enumerate(extensions):
+                if offset + STL_TEXT_SIZE >= len(text):
+                    extension = STL_LAST_BLOCK
+                blocks.append(STL_TTI.pack(
+                    0, subtitles % 0x10000, extension, 0, timeIn, timeOut,
+                    row, justification, 0,
+                    text[offset:offset + STL_TEXT_SIZE].ljust(STL_TEXT_SIZE,
+                                                              STL_FILLER)))
+            subtitles += 1
+
+        date = datetime.date.today().strftime('%y%m%d')
+        firstTimeCode = stlTimeCode(self.cues[0][0] if self.cues else 0, fps)
+        header = STL_GSI(fps, table, date, len(blocks), subtitles,
+                         '%02d%02d%02d%02d' % tuple(firstTimeCode))
+        self.write(header.encode('ascii') + b''.join(blocks))
+
+
+class PACWriter(SubtitleWriter):
+    """
+    PAC, in the code page of the file read (latin, cyrillic, thai, or
+    chinese in W16 blocks), or one guessed from the text. Each block is
+    written at once; without a code page the cues are collected until the
+    end, to guess it from all of them.
+    """
+
+    extension = '.pac'
+    binary = True
+
+    def begin(self):
+        self.cues = []
+        self.encodeText = None
+        if self.codePage is not None:
+            self.useCodePage(self.codePage)
+        self.write(PAC_FILE_HEADER)
+
+    def useCodePage(self, codePage):
+        self.codePage = codePage
+        self.encodeText = getTextEncoder(codePage)
+
+    def writeCue(self, number, start, end, text, layout=None):
+        if self.encodeText is None:
+            self.cues.append((number, start, end, text, layout))
+        else:
+            self.write(self.pacBlock(number, start, end, text, layout))
+
+    def end(self):
+        if self.encodeText is None:
+            self.useCodePage(guessCodePage(cue[3] for cue in self.cues))
+            self.write(b''.join(self.pacBlock(*cue) for cue in self.cues))
+            self.cues = []
+        self.write(PAC_FILE_TRAILER)
+
+    def pacBlock(self, number, start, end, text, layout):
+        """Return the bytes of a subtitle block"""
+
+        frameRate = self.frameRate
+        startCode = frameRate.pacFromFrames(
+            frameRate.framesFromMilliseconds(start))
+        endCode = frameRate.pacFromFrames(
+            frameRate.framesFromMilliseconds(end))
+        if layout is None:
+            verticalPosition = PAC_BOTTOM_POSITION
+            alignments = formats = b''
+            lines = text.split('\n')
+        else:
+            verticalPosition = layout.verticalPosition
+            alignments, formats = layout.alignments, layout.formats
+            lines = layout.splitLines(text)
+
+        body = bytearray()
+        encodeText = self.encodeText
+        for i, line in enumerate(lines):
+            body.append(0xfe)
+            body.append(alignments[i] if i < len(alignments) else
+                        alignments[-1] if alignments else PAC_CENTRED)
+            body.append(formats[i] if i < len(formats) else
+                        formats[-1] if formats else PAC_FORMAT)
+            body += self.lineCodes(i)
+            body += encodeText(line)
+        body = self.padding() + body
+        if len(body) >= PAC_MAX_TEXT_LENGTH:
+            raise PacError('Subtitle {0} is too long for a PAC block'.format(
+                number))
+
+        return b''.join([struct.pack('<HB', pacBlockNumber(number), 0x60),
+                         PAC_BLOCK_HEADER.pack(startCode >> 16,
+                                               startCode & 0xffff,
+                                               endCode >> 16, endCode & 0xffff,
+                                               len(body) + 1),
+                         bytes([verticalPosition]), body, b'\x00'])
+
+    def padding(self):
+        return b''
+
+    def lineCodes(self, i):
+        """Codes between the format code of line i and its text"""
+
+        if self.codePage != 'chinese':
+            return b''
+        return W16_NEXT_LINE if i else W16_FIRST_LINE
+
+
+class FPCWriter(PACWriter):
+    """FPC: PAC with utf-8 text"""
+
+    extension = '.fpc'
+
+    def begin(self):
+        self.codePage = 'utf-8'
+        PACWriter.begin(self)
+
+    def padding(self):
+        return FPC_PADDING
+
+    def lineCodes(self, i):
+        return FPC_LINE
+
+
+def pacBlockNumber(number):
+    """
+    Return the number written in the header of the number-th block (from 1),
+    counting only the numbers without a 0xFE byte
+    """
+
+    high, low = divmod((number - 1) % PAC_NUMBER_BASE ** 2, PAC_NUMBER_BASE)
+    return (high + (high >= 0xfe)) << 8 | low + (low >= 0xfe)
+
+
+def stlTimeCode(milliseconds, fps):
+    """Return the hours, minutes, seconds and frames bytes of a time"""
+
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    frames = min((milliseconds * fps + 500) // 1000, fps - 1)
+    return bytes([hours % 24, minutes, seconds, frames])
+
+
+def encodeSTLText(text, table):
+    """Encode text with the character code table of an EBU-STL file"""
+
+    if table == STL_CYRILLIC:
+        return text.replace('\n', '\x8a').encode('iso-8859-5', 'replace')
+    return text.translate(iso6937Translation()).encode('latin-1', 'replace')
+
+
+# Output formats by name
+WRITERS = {'': LineWriter,
+           'text': TextWriter,
+           'SRT': SRTWriter,
+           'VTT': VTTWriter,
+           'TTML': TTMLWriter,
+           'STL': STLWriter,
+           'PAC': PACWriter,
+           'FPC': FPCWriter}
+
+
+def registerWriter(outForm, writerClass):
+    """Register a SubtitleWriter class as the output format outForm"""
+
+    WRITERS[outForm] = writerClass
+
+
+def getWriter(outForm):
+    """Return the SubtitleWriter class of an output format"""
+
+    try:
+        return WRITERS[outForm]
+    except KeyError:
+        raise ValueError('Invalid output format: ' + outForm)
+
+
+def writeFormats(paragraphs, targets, frameRate=DEFAULT_FRAME_RATE,
+                 codePage=None):
+    """
+    Write paragraphs in several formats in a single pass over them.
+    targets is a list of (format, file object) pairs. frameRate and the
+    code page of the text are used by the formats that write frames and
+    bytes. Return the number of paragraphs written.
+    """
+
+    writers = [getWriter(outForm)(outf, frameRate, codePage)
+               for outForm, outf in targets]
+    for writer in writers:
+        writer.begin()
+
+    i = 0
+    if isinstance(paragraphs, SubtitleTrack):
+        # Formats are written a column at a time
+        for writer in writers:
+            writer.writeTrack(paragraphs)
+        i = len(paragraphs)
+    else:
+        writeCues = [writer.writeCue for writer in writers]
+        for i, line in enumerate(paragraphs, 1):
+            cue = (i, line.startTime.totalMilliseconds,
+                   line.endTime.totalMilliseconds, line.text,
+                   getattr(line, 'layout', None))
+            for writeCue in writeCues:
+                writeCue(*cue)
+
+    for writer in writers:
+        writer.end()
+
+    return i
+
+
+def writeParagraphs(paragraphs, outForm, outf, frameRate=DEFAULT_FRAME_RATE,
+                    codePage=None):
+    """
+    Write paragraphs to the file object outf in the format outForm (e.g.
+    text, SRT, or one paragraph per line), one at a time, return the number
+    of paragraphs written
+    """
+
+    return writeFormats(paragraphs, [(outForm, outf)], frameRate, codePage)
+
+
+def formatOut(paragraphs, outForm, frameRate=DEFAULT_FRAME_RATE,
+              codePage=None):
+    """
+    Format paragraphs in the format outForm, return str (or bytes for
+    binary formats)
+    """
+
+    strRtn = BytesIO() if getWriter(outForm).binary else StringIO()
+    writeParagraphs(paragraphs, outForm, strRtn, frameRate, codePage)
+    return strRtn.getvalue()
+
+
+def openOut(file, outForm):
+    """Open file to write the format outForm to"""
+
+    if getWriter(outForm).binary:
+        return open(file, 'wb', OUTPUT_BUFFER_SIZE)
+    return open(file, 'w', OUTPUT_BUFFER_SIZE, encoding=OUTPUT_ENCODING,
+                errors=OUTPUT_ERRORS)
+
+
+def writeOut(paragraphs, outForm, file, frameRate=DEFAULT_FRAME_RATE,
+             codePage=None):
+    """Write paragraphs to file, or stdout if no file is given"""
+
+    if file:
+        with openOut(file, outForm) as target:
+            writeParagraphs(paragraphs, outForm, target, frameRate, codePage)
+    elif getWriter(outForm).binary:
+        writeParagraphs(paragraphs, outForm, sys.stdout.buffer, frameRate,
+                        codePage)
+    else:
+        writeParagraphs(paragraphs, outForm, sys.stdout, frameRate, codePage)
+        sys.stdout.write("\n")
+
+
+def writeOutFiles(paragraphs, outputs, frameRate=DEFAULT_FRAME_RATE,
+                  codePage=None):
+    """
+    Write paragraphs to several files in a single pass. outputs is a list
+    of (format, file name) pairs.
+    """
+
+    targets = []
+    try:
+        for outForm, file in outputs:
+            targets.append((outForm, openOut(file, outForm)))
+        return writeFormats(paragraphs, targets, frameRate, codePage)
+    finally:
+        for outForm, target in targets:
+            target.close()
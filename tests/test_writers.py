@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# Two-line blocks read in rich mode keep their line break in every output
+# format. Run with: python3 -m unittest discover tests
+
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from pypacc.parser import iterPacParagraphs
+from pypacc.track import Paragraph, TimeCode
+from pypacc.writers import (STL_BOTTOM_ROW, STL_ROW_STEP, STL_TTI,
+                            formatOut)
+
+
+# Lines of the block written and read back
+LINES = ['First line', 'and the second']
+
+# Size of the EBU-STL General Subtitle Information block
+STL_GSI_SIZE = 1024
+
+
+def twoLineParagraphs():
+    """Write a PAC block of two lines, return its rich paragraphs"""
+
+    paragraph = Paragraph(TimeCode(milliseconds=1000),
+                          TimeCode(milliseconds=3000), '\n'.join(LINES))
+    data = formatOut([paragraph], 'PAC', codePage='latin')
+    return list(iterPacParagraphs(data, 'latin', rich=True))
+
+
+class TwoLineBlockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.paragraphs = twoLineParagraphs()
+
+    def test_read(self):
+        self.assertEqual(len(self.paragraphs), 1)
+        self.assertEqual(self.paragraphs[0].text, ' '.join(LINES))
+        self.assertEqual(self.paragraphs[0].layout.lineLengths,
+                         tuple(map(len, LINES)))
+
+    def test_vtt(self):
+        vtt = formatOut(self.paragraphs, 'VTT')
+        self.assertIn('\n' + '\n'.join(LINES) + '\n', vtt)
+
+    def test_ttml(self):
+        ttml = formatOut(self.paragraphs, 'TTML')
+        self.assertIn('>' + '<br/>'.join(LINES) + '</p>', ttml)
+
+    def test_stl(self):
+        stl = formatOut(self.paragraphs, 'STL')
+        tti = STL_TTI.unpack(stl[STL_GSI_SIZE:STL_GSI_SIZE + STL_TTI.size])
+        row, text = tti[6], tti[9]
+        self.assertEqual(row, STL_BOTTOM_ROW - STL_ROW_STEP)
+        self.assertTrue(text.startswith(
+            b'\x8a'.join(line.encode('ascii') for line in LINES)))
+
+
+if __name__ == '__main__':
+    unittest.main()